@@ -0,0 +1,127 @@
+"""
+Broadcast throughput against a local fake Bot API: the old sequential loop
+(copy_message + sleep(0.05)) vs the broadcast engine with N senders.
+
+    DATABASE_URL=sqlite+aiosqlite:////tmp/bench.db python -m benchmarks.bench_broadcast --chats 5000
+
+Seeds chat_records — point DATABASE_URL at a scratch database! The engine
+runs through the real rate limiter; --rate sets its global calls/second
+(Telegram allows about 30; raise it to see the engine's own ceiling).
+--resume interrupts each engine run halfway, resumes it and checks that
+no chat got the message twice and none was skipped.
+"""
+
+import argparse
+import asyncio
+import time
+
+from telegram import Bot
+from telegram.ext import ExtBot
+
+from benchmarks.fake_bot_api import FakeBotAPI
+from sqlalchemy import update
+
+from bot.database import (
+    BroadcastJob,
+    ChatRecord,
+    async_session,
+    engine,
+    init_db,
+    iter_active_chats,
+    upsert_chats,
+)
+from bot.services import broadcast, rate_limiter
+
+
+async def _seed(count: int) -> None:
+    # Exactly chats 1..count active: earlier runs may have seeded more, and
+    # deactivated the blocked ones
+    async with async_session() as session:
+        await session.execute(update(ChatRecord).values(is_active=False))
+        await session.commit()
+    await upsert_chats([
+        {"chat_id": chat_id, "chat_type": "private", "title": None, "username": None}
+        for chat_id in range(1, count + 1)
+    ])
+
+
+async def _legacy(bot: Bot) -> None:
+    async for batch in iter_active_chats():
+        for chat_id, _ in batch:
+            try:
+                await bot.copy_message(chat_id=chat_id, from_chat_id=1, message_id=1)
+                await asyncio.sleep(0.05)
+            except Exception:
+                pass
+
+
+async def _engine(bot: ExtBot, api: FakeBotAPI, count: int, resume: bool) -> BroadcastJob:
+    job_id = await broadcast.start(bot, from_chat_id=1, message_id=1, created_by=0, total=count)
+    if resume:
+        while sum(api.messages.values()) < count // 2:
+            await asyncio.sleep(0.05)
+        await broadcast.stop_all()
+        await broadcast.resume_orphaned(bot)
+    while broadcast._running:
+        await asyncio.gather(*(task for task, _ in broadcast._running.values()))
+    async with async_session() as session:
+        return await session.get(BroadcastJob, job_id)
+
+
+async def main(count: int, workers: list[int], latency: float, rate: float, blocked: float, resume: bool, legacy: bool) -> None:
+    await init_db()
+    api = FakeBotAPI(latency=latency)
+    api.blocked = set(range(1, count + 1, int(1 / blocked))) if blocked else set()
+    expected = count - len(api.blocked)
+
+    rate_limiter.GLOBAL_RATE = rate
+    ext_bot = ExtBot("0:fake", request=api, get_updates_request=FakeBotAPI(),
+                     rate_limiter=rate_limiter.TelegramRateLimiter())
+    await ext_bot.initialize()
+
+    print(f"{count} chats ({len(api.blocked)} blocked), Bot API latency {latency * 1000:.0f} ms, "
+          f"global limit {rate:.0f}/s")
+    print(f"{'mode':>12} {'seconds':>8} {'msg/s':>8} {'delivered':>10} {'dupes':>6} {'peak':>5}")
+
+    if legacy:
+        await _seed(count)
+        plain = Bot("0:fake", request=api, get_updates_request=FakeBotAPI())
+        await plain.initialize()
+        api.reset_stats()
+        t0 = time.perf_counter()
+        await _legacy(plain)
+        elapsed = time.perf_counter() - t0
+        delivered = sum(api.messages.values())
+        print(f"{'sequential':>12} {elapsed:>8.1f} {count / elapsed:>8.1f} {delivered:>10} "
+              f"{sum(times - 1 for times in api.messages.values()):>6} {api.peak_in_flight:>5}")
+
+    for n in workers:
+        await _seed(count)
+        broadcast.WORKERS = n
+        api.reset_stats()
+        t0 = time.perf_counter()
+        job = await _engine(ext_bot, api, count, resume)
+        elapsed = time.perf_counter() - t0
+        delivered = sum(api.messages.values())
+        dupes = sum(times - 1 for times in api.messages.values())
+        label = f"{n} senders" + (" +r" if resume else "")
+        print(f"{label:>12} {elapsed:>8.1f} {count / elapsed:>8.1f} {delivered:>10} {dupes:>6} {api.peak_in_flight:>5}")
+        if delivered != expected or dupes:
+            print(f"  ✗ expected {expected} deliveries without duplicates "
+                  f"(job: {job.sent} sent, {job.blocked} blocked, {job.failed} failed)")
+
+    await ext_bot.shutdown()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=5000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rate", type=float, default=rate_limiter.GLOBAL_RATE)
+    parser.add_argument("--blocked", type=float, default=0.02, help="fraction of chats that blocked the bot")
+    parser.add_argument("--resume", action="store_true", help="interrupt and resume each engine run")
+    parser.add_argument("--legacy", action="store_true", help="also time the old sequential loop")
+    args = parser.parse_args()
+    asyncio.run(main(args.chats, args.workers, args.latency, args.rate, args.blocked, args.resume, args.legacy))
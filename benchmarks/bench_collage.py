@@ -0,0 +1,140 @@
+"""
+Benchmark collage rendering per layout, split into assembly and encoding:
+
+  legacy  full decode + LANCZOS, fixed-quality JPEG (90 single / 92 grid)
+  fast    draft decode + COLLAGE_RESAMPLE, fixed-quality JPEG
+  budget  draft decode + COLLAGE_RESAMPLE, budgeted encode_collage()
+
+    python -m benchmarks.bench_collage --counts 1 2 3 4 6 9 12 --max-kb 1024 --format jpeg
+
+Inputs are synthetic phone-camera JPEGs (no database needed). Each
+(mode, count) pair runs in a fresh child process so the reported peak RSS
+is that layout's own high-water mark rather than the whole run's.
+--max-kb/--format/--progressive set the COLLAGE_* env for the children.
+With --max-rss-mb the run fails if any budget-mode render grows RSS by
+more than that (the COLLAGE_MEMORY_MB cap plus interpreter slack).
+"""
+
+import argparse
+import io
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+from bot.services import collage
+
+# mode -> (assemble_collage kwargs, budgeted encoder?)
+MODES = {
+    "legacy": ({"fast_decode": False, "resample": Image.Resampling.LANCZOS}, False),
+    "fast": ({"fast_decode": True, "resample": collage.RESAMPLE}, False),
+    "budget": ({"fast_decode": True, "resample": collage.RESAMPLE}, True),
+}
+
+
+def _legacy_encode(img: Image.Image, quality: int) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def make_jpeg(size: tuple[int, int], seed: int) -> bytes:
+    """A noisy gradient photo — compresses like a real one, unlike flat fills."""
+    w, h = size
+    img = Image.effect_noise((w, h), 40 + seed % 30).convert("RGB")
+    overlay = Image.linear_gradient("L").resize((w, h)).convert("RGB")
+    img = Image.blend(img, overlay, 0.5)
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((w // 8, h // 8, w // 2, h // 3), fill=(seed * 37 % 256, 90, 160))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=88)
+    return buf.getvalue()
+
+
+def _peak_rss_mb() -> float:
+    # VmHWM resets on exec; ru_maxrss survives it on Linux and would report
+    # the parent's peak from building the corpus
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run(mode: str, images: list[bytes], repeat: int, out) -> None:
+    baseline = _peak_rss_mb()
+    kwargs, budgeted = MODES[mode]
+    quality = collage.SINGLE_QUALITY if len(images) == 1 else collage.GRID_QUALITY
+    assemble, encode = [], []
+    data = b""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        canvas = collage.assemble_collage(images, **kwargs)
+        t1 = time.perf_counter()
+        data = collage.encode_collage(canvas, quality) if budgeted else _legacy_encode(canvas, quality)
+        t2 = time.perf_counter()
+        assemble.append((t1 - t0) * 1000)
+        encode.append((t2 - t1) * 1000)
+        del canvas
+    dims = "x".join(map(str, Image.open(io.BytesIO(data)).size))
+    out.put((
+        statistics.median(assemble), statistics.median(encode),
+        _peak_rss_mb(), _peak_rss_mb() - baseline, len(data), dims,
+    ))
+
+
+def main(counts: list[int], width: int, height: int, repeat: int, max_rss_mb: float | None) -> bool:
+    ctx = multiprocessing.get_context("spawn")
+    corpus = [make_jpeg((width, height), i) for i in range(max(counts))]
+    ok = True
+    print(f"inputs: {width}x{height} JPEG, avg {sum(map(len, corpus)) // len(corpus) // 1024} KiB")
+    print(
+        f"{'images':>6} {'mode':>7} {'build ms':>9} {'enc ms':>7} {'total':>7} "
+        f"{'peak MB':>8} {'+MB':>6} {'out KiB':>8} {'size':>10}"
+    )
+    for count in counts:
+        for mode in MODES:
+            out = ctx.Queue()
+            proc = ctx.Process(target=_run, args=(mode, corpus[:count], repeat, out))
+            proc.start()
+            build_ms, enc_ms, peak, delta, size, dims = out.get()
+            proc.join()
+            over = max_rss_mb is not None and mode == "budget" and delta > max_rss_mb
+            ok = ok and not over
+            print(
+                f"{count:>6} {mode:>7} {build_ms:>9.1f} {enc_ms:>7.1f} {build_ms + enc_ms:>7.1f} "
+                f"{peak:>8.1f} {delta:>6.1f} {size // 1024:>8} {dims:>10}"
+                + ("  OVER RSS LIMIT" if over else "")
+            )
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 2, 3, 4, 6, 9, 12])
+    parser.add_argument("--width", type=int, default=3000)
+    parser.add_argument("--height", type=int, default=4000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-kb", type=int, help="COLLAGE_MAX_KB for the budget mode")
+    parser.add_argument("--format", choices=["jpeg", "webp"], help="COLLAGE_FORMAT for the budget mode")
+    parser.add_argument("--progressive", action="store_true", help="COLLAGE_PROGRESSIVE=true")
+    parser.add_argument("--max-rss-mb", type=float, help="fail if a budget render grows RSS by more")
+    args = parser.parse_args()
+    # Read by bot.services.collage when each child process imports it
+    if args.max_kb:
+        os.environ["COLLAGE_MAX_KB"] = str(args.max_kb)
+    if args.format:
+        os.environ["COLLAGE_FORMAT"] = args.format
+    if args.progressive:
+        os.environ["COLLAGE_PROGRESSIVE"] = "true"
+    if not main(args.counts, args.width, args.height, args.repeat, args.max_rss_mb):
+        sys.exit(1)
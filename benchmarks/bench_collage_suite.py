@@ -0,0 +1,149 @@
+"""
+Collage render regression suite over a synthetic screenshot corpus.
+
+    python -m benchmarks.bench_collage_suite --out results.json
+    python -m benchmarks.bench_collage_suite --out new.json --baseline results.json --tolerance 0.15
+
+Runs create_grid_collage (the production pipeline) for every layout branch
+— 1, 2, the special 3-image layout, 2x2, 3x2, 3x3 and the >9
+ceil(count/3)-row grids, including a partial last row — over each corpus
+kind (benchmarks/corpus.py) and a mixed set. Each case runs in a fresh
+child process and records median wall and CPU time, peak RSS growth
+(VmHWM) and output size. Results are written as JSON; with --baseline,
+cases slower or bigger than baseline * (1 + tolerance) are reported and
+the exit status is 1. Compare runs from the same machine only.
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import time
+
+import PIL
+from PIL import Image
+
+from benchmarks.bench_collage import _peak_rss_mb
+from benchmarks.corpus import KINDS, make_set
+
+COUNTS = [1, 2, 3, 4, 6, 9, 10, 12]
+CORPUS_KINDS = [*KINDS, "mixed"]
+# Compared against --baseline; out_size changes are reported but not failed
+REGRESSION_METRICS = ["wall_ms", "cpu_ms", "rss_mb", "out_bytes"]
+
+
+def _run_case(kind: str, count: int, images: list[bytes], repeat: int, out) -> None:
+    from bot.services.collage import create_grid_collage
+
+    baseline = _peak_rss_mb()
+    wall, cpu = [], []
+    data = b""
+    for _ in range(repeat):
+        w0, c0 = time.perf_counter(), time.process_time()
+        data = create_grid_collage(list(images))
+        wall.append((time.perf_counter() - w0) * 1000)
+        cpu.append((time.process_time() - c0) * 1000)
+    out.put({
+        "kind": kind,
+        "count": count,
+        "wall_ms": round(statistics.median(wall), 1),
+        "cpu_ms": round(statistics.median(cpu), 1),
+        "rss_mb": round(_peak_rss_mb() - baseline, 1),
+        "out_bytes": len(data),
+        "out_size": list(Image.open(io.BytesIO(data)).size),
+        "in_bytes": sum(map(len, images)),
+    })
+
+
+def run(kinds: list[str], counts: list[int], repeat: int) -> list[dict]:
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for kind in kinds:
+        for count in counts:
+            # Built here rather than in the child: drawing 4000px canvases
+            # peaks above the render and would hide its memory use
+            images = make_set(kind, count)
+            out = ctx.Queue()
+            proc = ctx.Process(target=_run_case, args=(kind, count, images, repeat, out))
+            proc.start()
+            result = out.get()
+            proc.join()
+            results.append(result)
+            print(
+                f"{kind:>9} {count:>3}  wall {result['wall_ms']:>8.1f} ms  cpu {result['cpu_ms']:>8.1f} ms  "
+                f"+rss {result['rss_mb']:>6.1f} MB  out {result['out_bytes'] // 1024:>5} KiB "
+                f"{'x'.join(map(str, result['out_size']))}",
+                flush=True,
+            )
+    return results
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """Human-readable regressions against a previous run's JSON."""
+    old = {(c["kind"], c["count"]): c for c in baseline["cases"]}
+    regressions = []
+    for case in results:
+        prev = old.get((case["kind"], case["count"]))
+        if prev is None:
+            continue
+        if case["out_size"] != prev["out_size"]:
+            print(f"note: {case['kind']} x{case['count']} output size {prev['out_size']} -> {case['out_size']}")
+        for metric in REGRESSION_METRICS:
+            before, after = prev[metric], case[metric]
+            # Ignore tiny absolute values where noise dominates
+            if before <= 0 or (metric == "rss_mb" and after < 5):
+                continue
+            if after > before * (1 + tolerance):
+                regressions.append(
+                    f"{case['kind']} x{case['count']}: {metric} {before} -> {after} "
+                    f"(+{(after / before - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def _environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "collage_env": {k: v for k, v in sorted(os.environ.items()) if k.startswith("COLLAGE_")},
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kinds", nargs="+", choices=CORPUS_KINDS, default=CORPUS_KINDS)
+    parser.add_argument("--counts", type=int, nargs="+", default=COUNTS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative growth per metric")
+    args = parser.parse_args()
+
+    results = run(args.kinds, args.counts, args.repeat)
+    report = {"environment": _environment(), "cases": results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nno regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
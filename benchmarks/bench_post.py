@@ -0,0 +1,83 @@
+"""
+Benchmark post_report_to_channel end to end against a local fake Bot API:
+sequential screenshot downloads (concurrency 1, the old loop) vs concurrent.
+
+    DATABASE_URL=sqlite+aiosqlite:////tmp/bench.db python -m benchmarks.bench_post --latency 0.08
+
+Seeds reports — point DATABASE_URL at a scratch database! Collages render
+in-process (no worker pool), so the "post ms" column includes render time;
+"download ms" isolates the Bot API part. The collage cache and grid
+file_id reuse are disabled so every post does the full work.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("CHANNEL_ID", "-1001")
+
+from telegram import Bot
+
+from benchmarks.bench_collage import make_jpeg
+from benchmarks.fake_bot_api import FakeBotAPI
+from bot.database import create_report, engine, get_report_by_id, init_db
+from bot.services import channel, collage_cache
+
+
+async def _seed(api: FakeBotAPI, count: int, tag: str) -> int:
+    screenshots = []
+    for i in range(count):
+        file_id = f"{tag}-{i}"
+        api.add_file(file_id, make_jpeg((1080, 2340), i))
+        screenshots.append({"file_id": file_id, "file_unique_id": file_id})
+    report = await create_report(
+        user_id=1, username="bench", first_name="Bench", casino_name="benchcasino",
+        casino_link=None, amount_lost=None, description="benchmark", screenshots=screenshots,
+    )
+    return report.id
+
+
+async def main(counts: list[int], concurrencies: list[int], latency: float, repeat: int) -> None:
+    await init_db()
+    collage_cache.MAX_BYTES = 0
+    api = FakeBotAPI(latency=latency)
+    bot = Bot("0:fake", request=api, get_updates_request=FakeBotAPI())
+    await bot.initialize()
+
+    print(f"Bot API latency {latency * 1000:.0f} ms per call")
+    print(f"{'images':>6} {'conc':>5} {'download ms':>12} {'post ms':>9} {'calls':>6} {'peak':>5}")
+    for count in counts:
+        report_id = await _seed(api, count, f"r{count}")
+        report = await get_report_by_id(report_id, with_screenshots=True)
+        for conc in concurrencies:
+            channel.DOWNLOAD_CONCURRENCY = conc
+            dl_samples, post_samples = [], []
+            api.reset_stats()
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                await channel.download_screenshots(bot, report.get_screenshots())
+                dl_samples.append((time.perf_counter() - t0) * 1000)
+                report.grid_image_id = None
+                t0 = time.perf_counter()
+                await channel.post_report_to_channel(bot, report)
+                post_samples.append((time.perf_counter() - t0) * 1000)
+            calls = sum(api.calls.values()) // repeat
+            print(
+                f"{count:>6} {conc:>5} {statistics.median(dl_samples):>12.1f} "
+                f"{statistics.median(post_samples):>9.1f} {calls:>6} {api.peak_in_flight:>5}"
+            )
+
+    await bot.shutdown()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 3, 6, 9])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.08)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.counts, args.concurrency, args.latency, args.repeat))
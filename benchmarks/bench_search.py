@@ -0,0 +1,139 @@
+"""
+Benchmark /search: legacy ILIKE '%q%' scan vs the pg_trgm search_reports.
+
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.bench_search --rows 10000 100000 1000000
+
+Seeds `reports` (with their `report_screenshots` rows) and rebuilds
+casino_stats from them (SQLite's fuzzy match reads names from there) —
+point DATABASE_URL at a scratch database!
+The legacy query is timed with the trigram index dropped (as in production
+before it existed), then the index is rebuilt and search_reports is timed.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import string
+import time
+
+from sqlalchemy import delete, insert, select, text
+
+from bot.database import (
+    Report,
+    ReportScreenshot,
+    _is_postgres,
+    async_session,
+    engine,
+    init_db,
+    reconcile_stats,
+    search_reports,
+)
+
+QUERIES = ["hgbt bet", "kingcasin0", "win2u", "mega888", "zzzz-no-match"]
+BRANDS = ["hgbt", "kingcasino", "win2u", "mega888", "918kiss", "pussy888", "luckyspin", "asiabet"]
+TLDS = [".bet", ".com", ".net", ".vip", ".asia", ""]
+
+
+def _random_name(rng: random.Random) -> str:
+    if rng.random() < 0.2:
+        return rng.choice(BRANDS) + rng.choice(TLDS)
+    word = "".join(rng.choices(string.ascii_lowercase + string.digits, k=rng.randint(4, 12)))
+    return word + rng.choice(TLDS)
+
+
+async def _seed(rows: int, rng: random.Random, chunk: int = 10_000) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(delete(ReportScreenshot))
+        await conn.execute(delete(Report))
+    for start in range(0, rows, chunk):
+        ids = range(start + 1, min(start + chunk, rows) + 1)
+        batch = [
+            {
+                "id": report_id,
+                "user_id": rng.randint(1, 10_000_000),
+                "casino_name": _random_name(rng),
+                "description": "benchmark",
+            }
+            for report_id in ids
+        ]
+        # Screenshots live in report_screenshots, as for new reports
+        screenshots = [
+            {
+                "report_id": report_id,
+                "position": position,
+                "file_id": f"bench-{report_id}-{position}",
+                "file_unique_id": f"u{report_id}-{position}",
+                "width": 1080,
+                "height": 2340,
+            }
+            for report_id in ids
+            for position in range(rng.randint(0, 3))
+        ]
+        async with engine.begin() as conn:
+            await conn.execute(insert(Report), batch)
+            if screenshots:
+                await conn.execute(insert(ReportScreenshot), screenshots)
+    await reconcile_stats()
+    if _is_postgres():
+        async with engine.begin() as conn:
+            await conn.execute(text("ANALYZE reports"))
+            await conn.execute(text("ANALYZE report_screenshots"))
+
+
+async def _legacy_search(query: str) -> list[Report]:
+    async with async_session() as session:
+        stmt = (
+            select(Report)
+            .where(Report.casino_name.ilike(f"%{query}%"))
+            .order_by(Report.created_at.desc())
+            .limit(10)
+        )
+        return list((await session.execute(stmt)).scalars().all())
+
+
+async def _paged_search(query: str) -> list[Report]:
+    reports, _ = await search_reports(query)
+    return reports
+
+
+async def _time(fn, repeat: int) -> tuple[float, int]:
+    samples = []
+    hits = 0
+    for _ in range(repeat):
+        for q in QUERIES:
+            t0 = time.perf_counter()
+            hits += len(await fn(q))
+            samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), hits
+
+
+async def main(rows_list: list[int], repeat: int, seed: int) -> None:
+    await init_db()
+    rng = random.Random(seed)
+    print(f"{'rows':>10} {'legacy ms':>10} {'hits':>6} {'trgm ms':>10} {'hits':>6}")
+    for rows in rows_list:
+        await _seed(rows, rng)
+
+        if _is_postgres():
+            async with engine.begin() as conn:
+                await conn.execute(text("DROP INDEX IF EXISTS ix_reports_casino_name_trgm"))
+        legacy_ms, legacy_hits = await _time(_legacy_search, repeat)
+
+        await init_db()
+        if _is_postgres():
+            async with engine.begin() as conn:
+                await conn.execute(text("ANALYZE reports"))
+        new_ms, new_hits = await _time(_paged_search, repeat)
+
+        print(f"{rows:>10} {legacy_ms:>10.2f} {legacy_hits:>6} {new_ms:>10.2f} {new_hits:>6}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat, args.seed))
@@ -0,0 +1,116 @@
+"""
+Benchmark DB round trips and latency per handler: one session per CRUD
+call vs one unit of work per update.
+
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.bench_uow --iterations 200
+
+Each "handler" below replays the CRUD calls the real handler makes.
+Round trips = statements executed + commits + connection resets
+(the rollback a pooled connection gets when it is returned). Writes to the database —
+point DATABASE_URL at a scratch database!
+"""
+
+import argparse
+import asyncio
+import contextlib
+import statistics
+import time
+
+from sqlalchemy import event
+
+from bot import database
+from bot.database import (
+    commit_unit_of_work,
+    count_search_results,
+    create_report,
+    delete_report,
+    engine,
+    ensure_stats,
+    get_report_by_id,
+    init_db,
+    is_banned,
+    search_reports,
+    unit_of_work,
+    upsert_chat,
+)
+
+_round_trips = 0
+
+
+def _count(*args, **kwargs) -> None:
+    global _round_trips
+    _round_trips += 1
+
+
+async def _start(i: int) -> None:
+    await upsert_chat(chat_id=i, chat_type="private", first_name="bench")
+    await commit_unit_of_work()
+
+
+async def _report_start(i: int) -> None:
+    await is_banned(i)
+
+
+async def _confirm(i: int) -> None:
+    # The channel post is queued in the same transaction; the outbox worker sends it
+    await create_report(
+        i, None, "bench", "hgbt.bet", "hgbt.bet", None, "bench", [], post_to_channel=True, notify_chat_id=i
+    )
+    await commit_unit_of_work()
+
+
+async def _search(i: int) -> None:
+    await search_reports("hgbt")
+    await count_search_results("hgbt")
+
+
+async def _delete(i: int) -> None:
+    report, _ = await search_reports("hgbt", limit=1)
+    if report and await get_report_by_id(report[0].id):
+        await delete_report(report[0].id)
+        await commit_unit_of_work()
+
+
+HANDLERS = {
+    "/start": _start,
+    "/report (ban check, cache cold)": _report_start,
+    "confirm_report": _confirm,
+    "/search": _search,
+    "/delete": _delete,
+}
+
+
+async def _run(handler, iterations: int, scoped: bool) -> tuple[float, float]:
+    global _round_trips
+    _round_trips = 0
+    samples = []
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        async with unit_of_work() if scoped else contextlib.nullcontext():
+            await handler(i)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return _round_trips / iterations, statistics.median(samples)
+
+
+async def main(iterations: int) -> None:
+    await init_db()
+    await ensure_stats()
+    database._ban_cache = None  # measure the DB path of is_banned
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _count)
+    event.listen(engine.sync_engine, "commit", _count)
+    event.listen(engine.sync_engine.pool, "reset", _count)
+
+    print(f"{'handler':<34} {'trips/call':>10} {'ms':>8} | {'trips (uow)':>11} {'ms (uow)':>9}")
+    for name, handler in HANDLERS.items():
+        trips, ms = await _run(handler, iterations, scoped=False)
+        uow_trips, uow_ms = await _run(handler, iterations, scoped=True)
+        print(f"{name:<34} {trips:>10.1f} {ms:>8.2f} | {uow_trips:>11.1f} {uow_ms:>9.2f}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
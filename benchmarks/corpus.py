@@ -0,0 +1,77 @@
+"""
+Deterministic synthetic screenshots for the collage benchmarks.
+
+Each kind mimics evidence users actually send: UI chrome with text-like
+strokes (compresses like a real screenshot, unlike flat fills), an
+embedded photo region with noise, and realistic dimensions/formats.
+The same (kind, seed) always produces the same bytes.
+"""
+
+import io
+import random
+
+from PIL import Image, ImageDraw
+
+# kind -> (width, height, format, mode)
+KINDS = {
+    "phone": (1080, 2340, "JPEG", "RGB"),        # portrait phone screenshot
+    "desktop": (1920, 1080, "JPEG", "RGB"),      # landscape desktop capture
+    "png_alpha": (1080, 1920, "PNG", "RGBA"),    # PNG export with transparency
+    "huge": (4000, 3000, "JPEG", "RGB"),         # 12 MP camera photo of a screen
+}
+
+
+def make_screenshot(kind: str, seed: int) -> bytes:
+    """Encoded image bytes of the given kind."""
+    width, height, fmt, mode = KINDS[kind]
+    rng = random.Random(f"{kind}:{seed}")
+    bg = (rng.randint(220, 255),) * 3 if rng.random() < 0.7 else (rng.randint(10, 40),) * 3
+    img = Image.new("RGB", (width, height), bg)
+    draw = ImageDraw.Draw(img)
+
+    # Status/title bar
+    bar_h = max(40, height // 20)
+    draw.rectangle((0, 0, width, bar_h), fill=tuple(rng.randint(0, 255) for _ in range(3)))
+
+    # Embedded photo: noisy gradient block
+    pw, ph = width // 2, height // 4
+    photo = Image.frombytes("L", (pw, ph), rng.randbytes(pw * ph)).convert("RGB")
+    gradient = Image.linear_gradient("L").rotate(rng.choice([0, 90])).resize((pw, ph)).convert("RGB")
+    img.paste(Image.blend(photo, gradient, 0.6), (rng.randint(0, width - pw), bar_h + rng.randint(0, height // 3)))
+
+    # Chat bubbles with text-like strokes
+    y = bar_h + 20
+    line_h = max(14, height // 90)
+    while y < height - 4 * line_h:
+        bubble_w = rng.randint(width // 4, width * 3 // 4)
+        x = 20 if rng.random() < 0.5 else width - bubble_w - 20
+        lines = rng.randint(1, 4)
+        bubble_h = lines * line_h * 2 + line_h
+        fill = tuple(rng.randint(150, 255) for _ in range(3))
+        draw.rounded_rectangle((x, y, x + bubble_w, y + bubble_h), radius=line_h, fill=fill)
+        for i in range(lines):
+            ly = y + line_h + i * line_h * 2
+            lx = x + line_h
+            while lx < x + bubble_w - line_h * 3:
+                word = rng.randint(line_h, line_h * 5)
+                draw.rectangle((lx, ly, min(lx + word, x + bubble_w - line_h), ly + line_h // 2), fill=(20, 20, 20))
+                lx += word + line_h // 2
+        y += bubble_h + rng.randint(line_h, line_h * 3)
+
+    if mode == "RGBA":
+        img = img.convert("RGBA")
+        alpha = Image.linear_gradient("L").resize((width, height)).point(lambda v: 255 if v > 40 else v * 6)
+        img.putalpha(alpha)
+
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        img.save(buf, format="JPEG", quality=rng.randint(80, 95))
+    else:
+        img.save(buf, format="PNG", compress_level=6)
+    return buf.getvalue()
+
+
+def make_set(kind: str, count: int, seed: int = 0) -> list[bytes]:
+    """`count` screenshots of one kind, or of all kinds in turn for kind="mixed"."""
+    kinds = list(KINDS) if kind == "mixed" else [kind]
+    return [make_screenshot(kinds[i % len(kinds)], seed + i) for i in range(count)]
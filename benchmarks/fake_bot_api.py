@@ -0,0 +1,112 @@
+"""
+A local stand-in for the Telegram Bot API, plugged into PTB as its request backend.
+
+    bot = Bot(token, request=FakeBotAPI(latency=0.08), get_updates_request=FakeBotAPI())
+
+Every call sleeps `latency` seconds (file downloads additionally pay
+`bytes / bandwidth`), then answers with a minimal valid payload. Files
+registered with `add_file()` are served by getFile + download; chats in
+`blocked` answer 403 like a user who blocked the bot. Calls, messages per
+chat and peak concurrency are recorded for the benchmark to report.
+"""
+
+import asyncio
+import json
+import time
+from collections import Counter
+
+from telegram.request import BaseRequest, RequestData
+
+
+class FakeBotAPI(BaseRequest):
+    def __init__(self, latency: float = 0.05, bandwidth: float = 20e6):
+        self.latency = latency
+        self.bandwidth = bandwidth  # bytes/second for file downloads
+        self.files: dict[str, bytes] = {}
+        self.calls: Counter[str] = Counter()
+        self.messages: Counter[int] = Counter()  # chat_id -> messages delivered
+        self.blocked: set[int] = set()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._message_id = 0
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def add_file(self, file_id: str, data: bytes) -> None:
+        self.files[file_id] = data
+
+    def reset_stats(self) -> None:
+        self.calls.clear()
+        self.messages.clear()
+        self.peak_in_flight = 0
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: RequestData | None = None,
+        read_timeout=None,
+        write_timeout=None,
+        connect_timeout=None,
+        pool_timeout=None,
+    ) -> tuple[int, bytes]:
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if "/file/bot" in url:
+                self.calls["download"] += 1
+                data = self.files[url.rsplit("/", 1)[1]]
+                await asyncio.sleep(self.latency + len(data) / self.bandwidth)
+                return 200, data
+
+            api_method = url.rsplit("/", 1)[1]
+            self.calls[api_method] += 1
+            params = request_data.parameters if request_data else {}
+            await asyncio.sleep(self.latency)
+            chat_id = params.get("chat_id")
+            if chat_id is not None and int(chat_id) in self.blocked:
+                return 403, json.dumps({
+                    "ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user",
+                }).encode()
+            if api_method.startswith(("send", "copy", "forward")):
+                self.messages[int(chat_id)] += 1
+            return 200, json.dumps({"ok": True, "result": self._result(api_method, params)}).encode()
+        finally:
+            self.in_flight -= 1
+
+    def _result(self, api_method: str, params: dict):
+        if api_method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        if api_method == "getFile":
+            file_id = params["file_id"]
+            return {
+                "file_id": file_id,
+                "file_unique_id": file_id,
+                "file_size": len(self.files[file_id]),
+                "file_path": f"photos/{file_id}",
+            }
+        self._message_id += 1
+        chat_id = params.get("chat_id", 0)
+        message = {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id) if str(chat_id).lstrip("-").isdigit() else 0, "type": "channel"},
+        }
+        if api_method == "sendPhoto":
+            message["photo"] = [{
+                "file_id": f"grid{self._message_id}",
+                "file_unique_id": f"grid{self._message_id}",
+                "width": 1280,
+                "height": 1280,
+            }]
+        else:
+            message["text"] = params.get("text", "")
+        return message
@@ -1,26 +1,75 @@
 """Database models and CRUD operations for the scam casino bot."""
 
+import asyncio
+import difflib
+import functools
 import json
 import os
-from datetime import datetime, timezone
+import itertools
+import re
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
 
+from greenlet import getcurrent
 from sqlalchemy import (
     BigInteger,
     Boolean,
     Column,
     DateTime,
+    ForeignKey,
+    Index,
     Integer,
     String,
     Text,
+    any_,
+    bindparam,
+    delete,
+    event,
     func,
+    insert,
+    inspect,
+    or_,
     select,
+    text,
+    tuple_,
+    update,
 )
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, relationship, selectinload
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from bot.services.domains import link_domain_key
+from bot.services.phash import hamming
 
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 
+# Minimum difflib ratio for the non-Postgres fuzzy search fallback.
+# On Postgres the pg_trgm `%` operator uses pg_trgm.similarity_threshold (0.3).
+FUZZY_MIN_RATIO = float(os.getenv("FUZZY_MIN_RATIO", "0.6"))
+
+# Screenshots whose dHashes differ in at most this many of 64 bits count
+# as the same evidence
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "6"))
+
+# Connection pool (Postgres). Keep pool_size + max_overflow per replica
+# below the server's max_connections divided by the replica count.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds waiting for a connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds, -1 to disable
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# asyncpg prepared statement caches, per connection. Set both to 0 behind
+# PgBouncer in transaction pooling mode.
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_PREPARED_CACHE_SIZE = int(os.getenv("DB_PREPARED_CACHE_SIZE", "100"))
+
 
 class Base(DeclarativeBase):
     pass
@@ -28,6 +77,17 @@ class Base(DeclarativeBase):
 
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = (
+        # text_pattern_ops lets Postgres serve `LIKE 'prefix%'` from the btree;
+        # the trailing (created_at, id) serves /check keyset pages in order
+        Index(
+            "ix_reports_domain_key_created",
+            "domain_key", "created_at", "id",
+            postgresql_ops={"domain_key": "text_pattern_ops"},
+        ),
+        # Newest-first keyset pages of /search results
+        Index("ix_reports_created_id", text("created_at DESC"), text("id DESC")),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(BigInteger, nullable=False, index=True)
@@ -35,9 +95,10 @@ class Report(Base):
     first_name = Column(String(255), nullable=True)
     casino_name = Column(String(500), nullable=False, index=True)
     casino_link = Column(String(1000), nullable=True)
+    domain_key = Column(String(255), nullable=True)  # reversed canonical domain, e.g. "bet.hgbt"
     amount_lost = Column(String(100), nullable=True)
     description = Column(Text, nullable=False)
-    screenshots = Column(Text, default="[]")  # JSON array of file_ids
+    screenshots = Column(Text, nullable=True)  # legacy JSON array of file_ids, see report_screenshots
     grid_image_id = Column(String(500), nullable=True)  # Telegram file_id of grid
     channel_message_id = Column(BigInteger, nullable=True)
     created_at = Column(
@@ -45,14 +106,85 @@ class Report(Base):
         default=lambda: datetime.now(timezone.utc),
     )
 
+    # Not loaded implicitly — use get_report_by_id(..., with_screenshots=True)
+    screenshot_rows = relationship(
+        "ReportScreenshot",
+        order_by="ReportScreenshot.position",
+        lazy="raise",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
     def get_screenshots(self) -> list[str]:
+        """Screenshot file_ids in order (legacy JSON until the row is migrated)."""
+        if "screenshot_rows" not in inspect(self).unloaded and self.screenshot_rows:
+            return [s.file_id for s in self.screenshot_rows]
         try:
             return json.loads(self.screenshots or "[]")
         except (json.JSONDecodeError, TypeError):
             return []
 
-    def set_screenshots(self, file_ids: list[str]) -> None:
-        self.screenshots = json.dumps(file_ids)
+    def get_screenshot_sizes(self) -> list[list[dict]]:
+        """Per screenshot, every known PhotoSize (smallest first), in order."""
+        if "screenshot_rows" not in inspect(self).unloaded and self.screenshot_rows:
+            return [s.get_sizes() for s in self.screenshot_rows]
+        return [[{"file_id": file_id}] for file_id in self.get_screenshots()]
+
+    def needs_phashes(self) -> bool:
+        """True if some loaded screenshot row has no perceptual hash yet."""
+        if "screenshot_rows" in inspect(self).unloaded:
+            return False
+        return any(s.phash is None for s in self.screenshot_rows)
+
+    def get_screenshot_unique_ids(self) -> list[str] | None:
+        """Screenshot file_unique_ids in order; None unless all are known."""
+        if "screenshot_rows" in inspect(self).unloaded or not self.screenshot_rows:
+            return None
+        ids = [s.file_unique_id for s in self.screenshot_rows]
+        return ids if all(ids) else None
+
+
+class ReportScreenshot(Base):
+    """One evidence photo of a report, as Telegram described it."""
+    __tablename__ = "report_screenshots"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    report_id = Column(
+        Integer, ForeignKey("reports.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    position = Column(Integer, nullable=False)
+    file_id = Column(String(500), nullable=False)
+    file_unique_id = Column(String(100), nullable=True, index=True)  # stable across bots/re-uploads
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    file_size = Column(Integer, nullable=True)  # bytes
+    # JSON list of every PhotoSize Telegram offered ({file_id, width, height,
+    # file_size}, smallest first); the columns above describe the largest
+    sizes = Column(Text, nullable=True)
+    # 64-bit dHash (stored signed) and its four 16-bit chunks, each indexed
+    # for multi-index Hamming search — see find_similar_screenshots
+    phash = Column(BigInteger, nullable=True)
+    phash_0 = Column(Integer, nullable=True, index=True)
+    phash_1 = Column(Integer, nullable=True, index=True)
+    phash_2 = Column(Integer, nullable=True, index=True)
+    phash_3 = Column(Integer, nullable=True, index=True)
+
+    def get_phash(self) -> int | None:
+        """The dHash as an unsigned 64-bit int."""
+        return _to_unsigned(self.phash) if self.phash is not None else None
+
+    def get_sizes(self) -> list[dict]:
+        """All known variants of this photo, smallest first."""
+        try:
+            sizes = json.loads(self.sizes or "[]")
+        except (json.JSONDecodeError, TypeError):
+            sizes = []
+        return sizes or [{
+            "file_id": self.file_id,
+            "width": self.width,
+            "height": self.height,
+            "file_size": self.file_size,
+        }]
 
 
 class BannedUser(Base):
@@ -70,6 +202,15 @@ class BannedUser(Base):
 class ChatRecord(Base):
     """Track every chat (user/group/channel) the bot interacts with."""
     __tablename__ = "chat_records"
+    __table_args__ = (
+        # Partial (Postgres): broadcast enumeration and per-type counts are
+        # index-only scans over active chats
+        Index(
+            "ix_chat_records_active",
+            "chat_id", "chat_type",
+            postgresql_where=text("is_active"),
+        ),
+    )
 
     chat_id = Column(BigInteger, primary_key=True)
     chat_type = Column(String(20), nullable=False)  # private, group, supergroup, channel
@@ -83,21 +224,399 @@ class ChatRecord(Base):
     is_active = Column(Boolean, default=True)
 
 
+class CasinoStat(Base):
+    """Per-casino report count, kept in step with reports by create/delete."""
+    __tablename__ = "casino_stats"
+
+    casino_name = Column(String(500), primary_key=True)
+    report_count = Column(Integer, nullable=False, default=0, index=True)
+
+
+class Counter(Base):
+    """Named global counters (e.g. total reports)."""
+    __tablename__ = "counters"
+
+    name = Column(String(50), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+REPORTS_TOTAL = "reports_total"
+
+
+class ChannelPost(Base):
+    """
+    Outbox row: a report waiting to be posted to the channel.
+
+    Written in the same transaction as the report, so a committed report
+    always gets posted eventually; workers on any replica claim due rows
+    (see claim_channel_posts) and retry failures with backoff.
+    """
+    __tablename__ = "channel_posts"
+    __table_args__ = (
+        # Partial (Postgres): the claim query only ever scans pending rows
+        Index(
+            "ix_channel_posts_due",
+            "next_attempt_at",
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    report_id = Column(
+        Integer, ForeignKey("reports.id", ondelete="CASCADE"), nullable=False, unique=True
+    )
+    notify_chat_id = Column(BigInteger, nullable=True)  # reporter's chat, told when it's live
+    status = Column(String(20), nullable=False, default="pending")  # pending, posted, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
+    last_error = Column(Text, nullable=True)
+    created_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+    )
+    posted_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class BroadcastJob(Base):
+    """
+    A broadcast in progress or finished. `cursor` is the highest chat_id
+    handed to the senders; every chat up to it has a BroadcastDelivery row
+    (or is still to be sent after a hand-back moved the cursor back), so a
+    resumed job continues after the cursor without resending.
+    """
+    __tablename__ = "broadcast_jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    from_chat_id = Column(BigInteger, nullable=False)
+    message_id = Column(BigInteger, nullable=False)
+    created_by = Column(BigInteger, nullable=False)
+    status = Column(String(20), nullable=False, default="running")  # running, done, cancelled
+    cursor = Column(BigInteger, nullable=True)
+    total = Column(Integer, nullable=False, default=0)  # active chats when started
+    sent = Column(Integer, nullable=False, default=0)
+    blocked = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    # Owner's status message, edited with the summary
+    status_chat_id = Column(BigInteger, nullable=True)
+    status_message_id = Column(BigInteger, nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)  # lease of the replica sending it
+    created_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+    )
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class BroadcastDelivery(Base):
+    """
+    One chat of a broadcast. Written as "pending" just before the chat is
+    handed to a sender and updated in batches with the outcome. Rows still
+    pending when a job is taken over were possibly sent and become
+    "unknown" — never resent.
+    """
+    __tablename__ = "broadcast_deliveries"
+
+    job_id = Column(
+        Integer, ForeignKey("broadcast_jobs.id", ondelete="CASCADE"), primary_key=True
+    )
+    chat_id = Column(BigInteger, primary_key=True)
+    status = Column(String(10), nullable=False, default="pending")  # pending, sent, blocked, failed, unknown
+
+
+# ── Telemetry ─────────────────────────────────────────────────────
+
+_pool_stats = {
+    "checkouts": 0, "wait_total": 0.0, "wait_max": 0.0, "timeouts": 0,
+    "connects": 0, "connect_total": 0.0, "connect_max": 0.0,
+}
+# CRUD function name -> [calls, total seconds, max seconds, errors]
+_query_stats: dict[str, list] = {}
+
+
+class _TimedPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long each checkout waited for a free
+    connection, and separately how long opening new connections took.
+    """
+
+    # Seconds spent connecting during the checkout running in each greenlet
+    # (checkouts of concurrent tasks interleave in separate greenlets)
+    _connecting: dict = {}
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            _pool_stats["timeouts"] += 1
+            raise
+        finally:
+            connecting = self._connecting.pop(getcurrent(), 0.0)
+            waited = time.perf_counter() - start - connecting
+            _pool_stats["checkouts"] += 1
+            _pool_stats["wait_total"] += waited
+            _pool_stats["wait_max"] = max(_pool_stats["wait_max"], waited)
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            elapsed = time.perf_counter() - start
+            current = getcurrent()
+            self._connecting[current] = self._connecting.get(current, 0.0) + elapsed
+            _pool_stats["connects"] += 1
+            _pool_stats["connect_total"] += elapsed
+            _pool_stats["connect_max"] = max(_pool_stats["connect_max"], elapsed)
+
+
+def _timed(func):
+    """Record call count and latency of a CRUD coroutine under its name."""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        stats = _query_stats.setdefault(func.__name__, [0, 0.0, 0.0, 0])
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            stats[3] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+
+    return wrapper
+
+
+def db_stats() -> dict:
+    """Pool saturation, checkout wait and connect times, and per-function query times."""
+    pool = engine.pool
+    checkouts = _pool_stats["checkouts"]
+    connects = _pool_stats["connects"]
+    stats = {
+        "checkouts": checkouts,
+        "wait_avg_ms": _pool_stats["wait_total"] / checkouts * 1000 if checkouts else 0.0,
+        "wait_max_ms": _pool_stats["wait_max"] * 1000,
+        "timeouts": _pool_stats["timeouts"],
+        "connects": connects,
+        "connect_avg_ms": _pool_stats["connect_total"] / connects * 1000 if connects else 0.0,
+        "connect_max_ms": _pool_stats["connect_max"] * 1000,
+        "queries": {
+            name: {
+                "calls": calls,
+                "avg_ms": total / calls * 1000 if calls else 0.0,
+                "max_ms": worst * 1000,
+                "errors": errors,
+            }
+            for name, (calls, total, worst, errors) in _query_stats.items()
+        },
+    }
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        capacity = pool.size() + DB_MAX_OVERFLOW
+        stats.update(
+            pool_size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+            saturation=pool.checkedout() / capacity if capacity else 0.0,
+        )
+    return stats
+
+
 # ── Engine & Session ──────────────────────────────────────────────
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+
+def _engine_options(url: str) -> dict:
+    """Pool and driver options for create_async_engine, from env."""
+    options: dict = {"echo": False}
+    if url.startswith("postgresql"):
+        options.update(
+            poolclass=_TimedPool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+    if url.startswith("postgresql+asyncpg"):
+        options["connect_args"] = {
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": DB_PREPARED_CACHE_SIZE,
+        }
+    return options
+
+
+engine = create_async_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+# Postgres-only DDL, run after create_all. Every statement must be idempotent.
+_POSTGRES_DDL = [
+    # Trigram GIN index — serves both `%` similarity and ILIKE '%q%' lookups
+    "CREATE INDEX IF NOT EXISTS ix_reports_casino_name_trgm "
+    "ON reports USING gin (casino_name gin_trgm_ops)",
+    # Columns added after the first release (create_all never alters tables)
+    "ALTER TABLE reports ADD COLUMN IF NOT EXISTS domain_key VARCHAR(255)",
+    "ALTER TABLE report_screenshots ADD COLUMN IF NOT EXISTS sizes TEXT",
+    "ALTER TABLE report_screenshots ADD COLUMN IF NOT EXISTS phash BIGINT",
+    *(
+        stmt
+        for i in range(4)
+        for stmt in (
+            f"ALTER TABLE report_screenshots ADD COLUMN IF NOT EXISTS phash_{i} INTEGER",
+            f"CREATE INDEX IF NOT EXISTS ix_report_screenshots_phash_{i} ON report_screenshots (phash_{i})",
+        )
+    ),
+    "CREATE INDEX IF NOT EXISTS ix_reports_domain_key_created "
+    "ON reports (domain_key text_pattern_ops, created_at, id)",
+    "DROP INDEX IF EXISTS ix_reports_domain_key",
+    "CREATE INDEX IF NOT EXISTS ix_reports_created_id ON reports (created_at DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_casino_stats_casino_name_trgm "
+    "ON casino_stats USING gin (casino_name gin_trgm_ops)",
+    # Reports still holding JSON screenshots — keeps the migration's scan tiny
+    "CREATE INDEX IF NOT EXISTS ix_reports_legacy_screenshots "
+    "ON reports (id) WHERE screenshots IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_chat_records_active "
+    "ON chat_records (chat_id, chat_type) WHERE is_active",
+]
+
+
+# ── Unit of work ──────────────────────────────────────────────────
+#
+# Inside `unit_of_work()` every CRUD call made by the same task shares one
+# lazily opened session, and only flushes; the scope commits once at the
+# end. Outside it (background loops, scripts) each call still opens and
+# commits its own session. Passing `session=` explicitly always wins.
+
+
+class _UnitOfWork:
+    def __init__(self) -> None:
+        self.session: AsyncSession | None = None
+        # Tasks spawned inside the scope inherit the context var but must
+        # not share the session — it may be closed before they finish.
+        self.task = asyncio.current_task()
+
+
+_current_uow: ContextVar[_UnitOfWork | None] = ContextVar("db_unit_of_work", default=None)
+
+
+@asynccontextmanager
+async def unit_of_work():
+    """Share one session across the CRUD calls in this block; commit once at exit."""
+    uow = _UnitOfWork()
+    token = _current_uow.set(uow)
+    try:
+        yield
+        if uow.session is not None and uow.session.info.get("writes"):
+            await uow.session.commit()
+    except BaseException:
+        if uow.session is not None:
+            await uow.session.rollback()
+        raise
+    finally:
+        _current_uow.reset(token)
+        if uow.session is not None:
+            await uow.session.close()
+
+
+async def commit_unit_of_work() -> None:
+    """
+    Commit the current unit of work early (no-op outside one).
+
+    Use before slow outbound calls so row locks and the pooled connection
+    aren't held across them.
+    """
+    uow = _current_uow.get()
+    if uow is not None and uow.session is not None and uow.task is asyncio.current_task():
+        await uow.session.commit()
+        uow.session.info.pop("writes", None)
+
+
+@asynccontextmanager
+async def _session(session: AsyncSession | None = None):
+    """Session for one CRUD call: explicit, else the unit of work's, else a fresh one."""
+    if session is not None:
+        yield session
+        return
+
+    uow = _current_uow.get()
+    if uow is not None and uow.task is asyncio.current_task():
+        if uow.session is None:
+            uow.session = async_session()
+        yield uow.session
+        return
+
+    async with async_session() as own:
+        own.info["owned"] = True
+        yield own
+
+
+async def _commit(session: AsyncSession) -> None:
+    """Commit a session we opened ourselves; only flush a shared one."""
+    if session.info.get("owned"):
+        await session.commit()
+    else:
+        await session.flush()
+        session.info["writes"] = True
+
+
+def _after_commit(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """
+    Run `callback` once the session's writes are committed; dropped if the
+    transaction rolls back. Runs at once for a session _commit() committed.
+    """
+    if session.info.get("owned"):
+        callback()
+        return
+    pending = session.info.get("after_commit")
+    if pending is None:
+        pending = session.info["after_commit"] = []
+        sync_session = session.sync_session
+
+        @event.listens_for(sync_session, "after_commit")
+        def _run(_):
+            callbacks = list(pending)
+            pending.clear()
+            for cb in callbacks:
+                cb()
+
+        @event.listens_for(sync_session, "after_rollback")
+        def _discard(_):
+            pending.clear()
+
+    pending.append(callback)
+
+
+def _is_postgres() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def _insert(model):
+    """Dialect-specific INSERT that supports on_conflict_do_update()."""
+    return pg_insert(model) if _is_postgres() else sqlite_insert(model)
+
+
 async def init_db() -> None:
-    """Create all tables."""
+    """Create all tables (plus pg_trgm extension and indexes on Postgres)."""
     async with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(Base.metadata.create_all)
+        if conn.dialect.name == "postgresql":
+            for ddl in _POSTGRES_DDL:
+                await conn.execute(text(ddl))
 
 
 # ── Report CRUD ───────────────────────────────────────────────────
 
 
+@_timed
 async def create_report(
     user_id: int,
     username: str | None,
@@ -106,68 +625,589 @@ async def create_report(
     casino_link: str | None,
     amount_lost: str | None,
     description: str,
-    screenshot_ids: list[str],
+    screenshots: list[dict],
+    post_to_channel: bool = False,
+    notify_chat_id: int | None = None,
+    session: AsyncSession | None = None,
 ) -> Report:
-    async with async_session() as session:
+    """
+    Save a new report. `screenshots` are dicts with file_id and optionally
+    file_unique_id, width, height, file_size, sizes (every PhotoSize as
+    {file_id, width, height, file_size}, smallest first) and phash (dHash).
+
+    With `post_to_channel`, a channel post job is queued in the same
+    transaction; `notify_chat_id` is told once it's posted.
+    """
+    async with _session(session) as session:
         report = Report(
             user_id=user_id,
             username=username,
             first_name=first_name,
             casino_name=casino_name,
             casino_link=casino_link,
+            domain_key=link_domain_key(casino_link),
             amount_lost=amount_lost,
             description=description,
+            screenshot_rows=[
+                ReportScreenshot(
+                    position=position,
+                    file_id=shot["file_id"],
+                    file_unique_id=shot.get("file_unique_id"),
+                    width=shot.get("width"),
+                    height=shot.get("height"),
+                    file_size=shot.get("file_size"),
+                    sizes=json.dumps(shot["sizes"]) if shot.get("sizes") else None,
+                    **_phash_columns(shot.get("phash")),
+                )
+                for position, shot in enumerate(screenshots)
+            ],
         )
-        report.set_screenshots(screenshot_ids)
         session.add(report)
-        await session.commit()
-        await session.refresh(report)
+        await _bump_stats(session, casino_name, 1)
+        if post_to_channel:
+            await session.flush()  # assigns report.id
+            session.add(ChannelPost(report_id=report.id, notify_chat_id=notify_chat_id))
+        await _commit(session)
         return report
 
 
-async def update_report_channel_msg(report_id: int, message_id: int, grid_image_id: str | None = None) -> None:
-    async with async_session() as session:
+@_timed
+async def update_report_channel_msg(
+    report_id: int,
+    message_id: int,
+    grid_image_id: str | None = None,
+    session: AsyncSession | None = None,
+) -> None:
+    async with _session(session) as session:
         report = await session.get(Report, report_id)
         if report:
             report.channel_message_id = message_id
             if grid_image_id:
                 report.grid_image_id = grid_image_id
-            await session.commit()
+            await _commit(session)
 
 
-async def search_reports(query: str) -> list[Report]:
-    async with async_session() as session:
-        stmt = (
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input is matched literally."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _fuzzy_key(value: str) -> str:
+    """Lowercase and drop punctuation/spaces: 'HGBT bet' -> 'hgbtbet'."""
+    return re.sub(r"[\W_]+", "", value.lower())
+
+
+# (created_at, id) of a row — pages continue strictly after/before it
+Cursor = tuple[datetime, int]
+
+
+async def _keyset_page(
+    session: AsyncSession,
+    condition,
+    cursor: Cursor | None,
+    backward: bool,
+    limit: int,
+) -> tuple[list[Report], bool]:
+    """
+    Fetch one page of reports, newest first, keyed on (created_at, id).
+
+    Every page is the same bounded index read however deep it is. Returns
+    the page and whether more rows exist past it in the direction read.
+    """
+    key = tuple_(Report.created_at, Report.id)
+    stmt = select(Report).where(condition)
+    if cursor is not None:
+        stmt = stmt.where(key > tuple_(*cursor) if backward else key < tuple_(*cursor))
+    if backward:
+        stmt = stmt.order_by(Report.created_at.asc(), Report.id.asc())
+    else:
+        stmt = stmt.order_by(Report.created_at.desc(), Report.id.desc())
+
+    result = await session.execute(stmt.limit(limit + 1))
+    reports = list(result.scalars().all())
+    has_more = len(reports) > limit
+    reports = reports[:limit]
+    if backward:
+        reports.reverse()
+    return reports, has_more
+
+
+async def _casino_name_condition(session: AsyncSession, column, query: str):
+    """
+    Fuzzy "casino name matches query" condition on `column`.
+
+    Postgres uses pg_trgm (`%` similarity or ILIKE, both served by the GIN
+    index) so typos like "kingcasin0" still match. Other backends (SQLite
+    for local dev) rank the distinct names from casino_stats with difflib.
+    """
+    if _is_postgres():
+        return column.op("%")(query) | column.ilike(f"%{_escape_like(query)}%", escape="\\")
+
+    key = _fuzzy_key(query)
+    names = (await session.execute(select(CasinoStat.casino_name))).scalars().all()
+    matched = []
+    for name in names:
+        name_key = _fuzzy_key(name)
+        if key and key in name_key:
+            matched.append(name)
+        elif difflib.SequenceMatcher(None, key, name_key).ratio() >= FUZZY_MIN_RATIO:
+            matched.append(name)
+    return column.in_(matched)
+
+
+def _domain_condition(key: str):
+    condition = Report.domain_key == key
+    if "." in key:
+        # Subdomains too — but never a bare TLD like "bet"
+        condition |= Report.domain_key.like(f"{_escape_like(key)}.%", escape="\\")
+    return condition
+
+
+@_timed
+async def search_reports(
+    query: str,
+    cursor: Cursor | None = None,
+    backward: bool = False,
+    limit: int = 10,
+    session: AsyncSession | None = None,
+) -> tuple[list[Report], bool]:
+    """Fuzzy search reports by casino name; one keyset page, newest first."""
+    query = query.strip()
+    if not query:
+        return [], False
+
+    async with _session(session) as session:
+        condition = await _casino_name_condition(session, Report.casino_name, query)
+        return await _keyset_page(session, condition, cursor, backward, limit)
+
+
+@_timed
+async def count_search_results(query: str, session: AsyncSession | None = None) -> int:
+    """Total reports matching a search, summed from the casino_stats counters."""
+    query = query.strip()
+    if not query:
+        return 0
+
+    async with _session(session) as session:
+        condition = await _casino_name_condition(session, CasinoStat.casino_name, query)
+        total = await session.scalar(
+            select(func.sum(CasinoStat.report_count)).where(condition)
+        )
+        return total or 0
+
+
+@_timed
+async def check_link(
+    link: str,
+    cursor: Cursor | None = None,
+    backward: bool = False,
+    limit: int = 10,
+    session: AsyncSession | None = None,
+) -> tuple[list[Report], bool]:
+    """
+    Find reports for a link's domain or any of its subdomains.
+
+    "hgbt.bet" matches reports on hgbt.bet and m.hgbt.bet — an exact plus
+    prefix range lookup on the reversed-domain index, never a table scan.
+    """
+    key = link_domain_key(link)
+    if not key:
+        return [], False
+
+    async with _session(session) as session:
+        return await _keyset_page(session, _domain_condition(key), cursor, backward, limit)
+
+
+@_timed
+async def count_link_reports(link: str, session: AsyncSession | None = None) -> int:
+    """Total reports for a domain — counted from the domain_key index range."""
+    key = link_domain_key(link)
+    if not key:
+        return 0
+
+    async with _session(session) as session:
+        total = await session.scalar(
+            select(func.count()).select_from(Report).where(_domain_condition(key))
+        )
+        return total or 0
+
+
+async def backfill_domain_keys(batch_size: int = 1000) -> int:
+    """
+    Fill domain_key for reports created before the column existed.
+
+    Walks the table by primary key in chunks (one short transaction each),
+    so it can run online without loading every row. Returns rows updated.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        async with async_session() as session:
+            result = await session.execute(
+                select(Report.id, Report.casino_link)
+                .where(
+                    Report.id > last_id,
+                    Report.domain_key.is_(None),
+                    Report.casino_link.is_not(None),
+                )
+                .order_by(Report.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                return updated
+
+            values = [
+                {"id": report_id, "domain_key": key}
+                for report_id, link in rows
+                if (key := link_domain_key(link))
+            ]
+            if values:
+                await session.execute(update(Report), values)
+                await session.commit()
+            updated += len(values)
+            last_id = rows[-1][0]
+
+
+@_timed
+async def get_report_by_id(
+    report_id: int,
+    with_screenshots: bool = False,
+    session: AsyncSession | None = None,
+) -> Report | None:
+    async with _session(session) as session:
+        options = [selectinload(Report.screenshot_rows)] if with_screenshots else []
+        return await session.get(Report, report_id, options=options)
+
+
+@_timed
+async def find_reports_by_screenshot(
+    file_unique_id: str,
+    session: AsyncSession | None = None,
+) -> list[Report]:
+    """Reports whose evidence includes the given photo (by file_unique_id)."""
+    async with _session(session) as session:
+        result = await session.execute(
             select(Report)
-            .where(Report.casino_name.ilike(f"%{query}%"))
+            .join(ReportScreenshot, ReportScreenshot.report_id == Report.id)
+            .where(ReportScreenshot.file_unique_id == file_unique_id)
             .order_by(Report.created_at.desc())
-            .limit(10)
+            .distinct()
         )
-        result = await session.execute(stmt)
         return list(result.scalars().all())
 
 
-async def check_link(link: str) -> list[Report]:
-    async with async_session() as session:
+# ── Perceptual hashes ────────────────────────────────────────────
+#
+# Multi-index hashing: the 64-bit hash is split into four 16-bit chunks.
+# If two hashes differ in at most k bits, at least one chunk differs in at
+# most k // 4 bits (pigeonhole), so candidates are rows where some chunk
+# equals one of the query chunk's variants within that radius — four
+# indexed IN lookups instead of a table scan — then the exact distance is
+# checked in Python.
+
+_CHUNKS = 4
+_CHUNK_BITS = 16
+
+
+def _to_signed(h: int) -> int:
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+def _to_unsigned(h: int) -> int:
+    return h & ((1 << 64) - 1)
+
+
+def _hash_chunks(h: int) -> list[int]:
+    mask = (1 << _CHUNK_BITS) - 1
+    return [(h >> (_CHUNK_BITS * i)) & mask for i in range(_CHUNKS)]
+
+
+def _phash_columns(h: int | None) -> dict:
+    """Column values for a dHash (all None when unknown)."""
+    if h is None:
+        return {"phash": None, **{f"phash_{i}": None for i in range(_CHUNKS)}}
+    return {
+        "phash": _to_signed(h),
+        **{f"phash_{i}": chunk for i, chunk in enumerate(_hash_chunks(h))},
+    }
+
+
+def _chunk_variants(chunk: int, radius: int) -> list[int]:
+    """All 16-bit values within `radius` bits of `chunk`."""
+    variants = [chunk]
+    for r in range(1, radius + 1):
+        for bits in itertools.combinations(range(_CHUNK_BITS), r):
+            flipped = chunk
+            for bit in bits:
+                flipped ^= 1 << bit
+            variants.append(flipped)
+    return variants
+
+
+@_timed
+async def find_similar_screenshots(
+    hashes: list[int | None],
+    max_distance: int = PHASH_MAX_DISTANCE,
+    exclude_report_id: int | None = None,
+    session: AsyncSession | None = None,
+) -> list[dict]:
+    """
+    Stored screenshots within `max_distance` bits of any of `hashes`.
+
+    Returns dicts with index (position in `hashes`), report_id, position,
+    casino_name, user_id and distance, closest first.
+    """
+    radius = max_distance // _CHUNKS
+    matches = []
+    async with _session(session) as session:
+        for index, h in enumerate(hashes):
+            if h is None:
+                continue
+            conditions = [
+                getattr(ReportScreenshot, f"phash_{i}").in_(_chunk_variants(chunk, radius))
+                for i, chunk in enumerate(_hash_chunks(h))
+            ]
+            stmt = (
+                select(
+                    ReportScreenshot.report_id,
+                    ReportScreenshot.position,
+                    ReportScreenshot.phash,
+                    Report.casino_name,
+                    Report.user_id,
+                )
+                .join(Report, Report.id == ReportScreenshot.report_id)
+                .where(or_(*conditions))
+            )
+            if exclude_report_id is not None:
+                stmt = stmt.where(ReportScreenshot.report_id != exclude_report_id)
+            for row in await session.execute(stmt):
+                distance = hamming(_to_unsigned(row.phash), h)
+                if distance <= max_distance:
+                    matches.append({
+                        "index": index,
+                        "report_id": row.report_id,
+                        "position": row.position,
+                        "casino_name": row.casino_name,
+                        "user_id": row.user_id,
+                        "distance": distance,
+                    })
+    matches.sort(key=lambda m: (m["distance"], m["report_id"]))
+    return matches
+
+
+@_timed
+async def set_screenshot_hashes(
+    report_id: int,
+    hashes: dict[int, int],
+    session: AsyncSession | None = None,
+) -> None:
+    """Fill in dHashes (position -> hash) of a report's screenshots that have none."""
+    if not hashes:
+        return
+    async with _session(session) as session:
+        # Core table: an ORM update() with a parameter list would be a bulk
+        # update by primary key, which doesn't allow this WHERE clause
+        table = ReportScreenshot.__table__
         stmt = (
-            select(Report)
-            .where(Report.casino_link.ilike(f"%{link}%"))
-            .order_by(Report.created_at.desc())
-            .limit(10)
+            update(table)
+            .where(
+                table.c.report_id == report_id,
+                table.c.position == bindparam("b_position"),
+                table.c.phash.is_(None),
+            )
+            .values(
+                phash=bindparam("b_phash"),
+                **{f"phash_{i}": bindparam(f"b_phash_{i}") for i in range(_CHUNKS)},
+            )
         )
-        result = await session.execute(stmt)
-        return list(result.scalars().all())
+        params = [
+            {"b_position": position, **{f"b_{k}": v for k, v in _phash_columns(h).items()}}
+            for position, h in hashes.items()
+        ]
+        await session.execute(stmt, params)
+        await _commit(session)
+
+
+async def migrate_legacy_screenshots(batch_size: int = 500) -> int:
+    """
+    Move JSON screenshot lists into report_screenshots, a chunk at a time.
+
+    Each chunk inserts the child rows and clears the JSON column in one
+    transaction, so an interrupted run resumes without duplicates.
+    Returns the number of reports migrated.
+    """
+    migrated = 0
+    last_id = 0
+    while True:
+        async with async_session() as session:
+            result = await session.execute(
+                select(Report.id, Report.screenshots)
+                .where(
+                    Report.id > last_id,
+                    Report.screenshots.is_not(None),
+                )
+                .order_by(Report.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                return migrated
+
+            children = []
+            for report_id, raw in rows:
+                try:
+                    file_ids = json.loads(raw or "[]")
+                except (json.JSONDecodeError, TypeError):
+                    file_ids = []
+                children.extend(
+                    {"report_id": report_id, "position": position, "file_id": file_id}
+                    for position, file_id in enumerate(file_ids)
+                )
+            if children:
+                await session.execute(insert(ReportScreenshot), children)
+            await session.execute(
+                update(Report)
+                .where(Report.id.in_([report_id for report_id, _ in rows]))
+                .values(screenshots=None)
+            )
+            await session.commit()
+            migrated += len(rows)
+            last_id = rows[-1][0]
+
+
+@_timed
+async def delete_report(report_id: int, session: AsyncSession | None = None) -> bool:
+    async with _session(session) as session:
+        report = await session.get(Report, report_id)
+        if report:
+            # Explicit, since SQLite doesn't enforce ON DELETE CASCADE by default
+            await session.execute(
+                delete(ReportScreenshot).where(ReportScreenshot.report_id == report_id)
+            )
+            await session.execute(delete(ChannelPost).where(ChannelPost.report_id == report_id))
+            await session.delete(report)
+            await _bump_stats(session, report.casino_name, -1)
+            await _commit(session)
+            return True
+        return False
+
+
+# ── Channel post outbox ───────────────────────────────────────────
+#
+# A claim moves next_attempt_at past the lease instead of holding the row
+# lock while posting (downloads, render and upload take seconds). Other
+# workers skip the row until the lease runs out, so a worker that dies
+# mid-post only delays the job. The claim itself uses FOR UPDATE SKIP
+# LOCKED, so concurrent claimers on other replicas never wait on or take
+# the same rows (SQLite ignores the clause; it has a single writer anyway).
 
 
-async def get_stats() -> dict:
+@_timed
+async def claim_channel_posts(limit: int, lease: float) -> list[tuple[int, int, int | None, int]]:
+    """
+    Claim up to `limit` due jobs for `lease` seconds.
+
+    Returns (job_id, report_id, notify_chat_id, attempts) with attempts
+    already counting this one.
+    """
+    now = datetime.now(timezone.utc)
+    async with async_session() as session:
+        jobs = (await session.execute(
+            select(ChannelPost)
+            .where(ChannelPost.status == "pending", ChannelPost.next_attempt_at <= now)
+            .order_by(ChannelPost.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )).scalars().all()
+        for job in jobs:
+            job.attempts += 1
+            job.next_attempt_at = now + timedelta(seconds=lease)
+        await session.commit()
+        return [(job.id, job.report_id, job.notify_chat_id, job.attempts) for job in jobs]
+
+
+@_timed
+async def finish_channel_post(job_id: int, status: str = "posted", error: str | None = None) -> None:
+    """Mark a job posted (or permanently failed)."""
     async with async_session() as session:
-        total = await session.scalar(select(func.count(Report.id)))
+        await session.execute(
+            update(ChannelPost)
+            .where(ChannelPost.id == job_id)
+            .values(
+                status=status,
+                last_error=error,
+                posted_at=datetime.now(timezone.utc) if status == "posted" else None,
+            )
+        )
+        await session.commit()
+
+
+@_timed
+async def retry_channel_post(
+    job_id: int,
+    delay: float,
+    error: str | None = None,
+    refund: bool = False,
+) -> None:
+    """Release a claimed job to run again in `delay` seconds; `refund` doesn't count the attempt."""
+    values = {
+        "next_attempt_at": datetime.now(timezone.utc) + timedelta(seconds=delay),
+        "last_error": error,
+    }
+    if refund:
+        values["attempts"] = ChannelPost.attempts - 1
+    async with async_session() as session:
+        await session.execute(update(ChannelPost).where(ChannelPost.id == job_id).values(**values))
+        await session.commit()
+
+
+@_timed
+async def count_channel_posts_by_status(session: AsyncSession | None = None) -> dict[str, int]:
+    async with _session(session) as session:
+        result = await session.execute(
+            select(ChannelPost.status, func.count()).group_by(ChannelPost.status)
+        )
+        return dict(result.all())
+
+
+# ── Stats ─────────────────────────────────────────────────────────
+
+
+async def _bump_stats(session: AsyncSession, casino_name: str, delta: int) -> None:
+    """Adjust counters inside the caller's transaction."""
+    stmt = _insert(CasinoStat).values(casino_name=casino_name, report_count=delta)
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=[CasinoStat.casino_name],
+        set_={"report_count": CasinoStat.report_count + delta},
+    ))
+    if delta < 0:
+        await session.execute(
+            delete(CasinoStat).where(
+                CasinoStat.casino_name == casino_name,
+                CasinoStat.report_count <= 0,
+            )
+        )
+
+    stmt = _insert(Counter).values(name=REPORTS_TOTAL, value=delta)
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=[Counter.name],
+        set_={"value": Counter.value + delta},
+    ))
+
+
+@_timed
+async def get_stats(session: AsyncSession | None = None) -> dict:
+    """Total and top 5 casinos, read from the counters tables."""
+    async with _session(session) as session:
+        total = await session.scalar(
+            select(Counter.value).where(Counter.name == REPORTS_TOTAL)
+        )
 
         # Top 5 most reported casinos
         stmt = (
-            select(Report.casino_name, func.count(Report.id).label("count"))
-            .group_by(Report.casino_name)
-            .order_by(func.count(Report.id).desc())
+            select(CasinoStat.casino_name, CasinoStat.report_count)
+            .order_by(CasinoStat.report_count.desc())
             .limit(5)
         )
         result = await session.execute(stmt)
@@ -176,50 +1216,147 @@ async def get_stats() -> dict:
         return {"total": total or 0, "top_casinos": top_casinos}
 
 
-async def get_report_by_id(report_id: int) -> Report | None:
+@_timed
+async def reconcile_stats() -> dict:
+    """
+    Rebuild the counters from a live aggregate over reports.
+
+    Returns the live total, the previously stored total and a list of
+    (casino_name, stored, live) rows that had drifted.
+    """
     async with async_session() as session:
-        return await session.get(Report, report_id)
+        if _is_postgres():
+            # Block concurrent create/delete bumps until the rebuild commits
+            await session.execute(text("LOCK TABLE casino_stats, counters IN EXCLUSIVE MODE"))
+
+        result = await session.execute(
+            select(Report.casino_name, func.count(Report.id)).group_by(Report.casino_name)
+        )
+        live = dict(result.all())
+        result = await session.execute(select(CasinoStat.casino_name, CasinoStat.report_count))
+        stored = dict(result.all())
+        stored_total = await session.scalar(
+            select(Counter.value).where(Counter.name == REPORTS_TOTAL)
+        )
+
+        drift = [
+            (name, stored.get(name, 0), live.get(name, 0))
+            for name in sorted(set(live) | set(stored))
+            if stored.get(name, 0) != live.get(name, 0)
+        ]
+        live_total = sum(live.values())
+
+        await session.execute(delete(CasinoStat))
+        if live:
+            await session.execute(
+                _insert(CasinoStat),
+                [{"casino_name": n, "report_count": c} for n, c in live.items()],
+            )
+        stmt = _insert(Counter).values(name=REPORTS_TOTAL, value=live_total)
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=[Counter.name], set_={"value": live_total},
+        ))
+        await session.commit()
 
+        return {"total": live_total, "stored_total": stored_total, "drift": drift}
 
-async def delete_report(report_id: int) -> bool:
+
+async def ensure_stats() -> None:
+    """Seed the counters on first start after upgrading."""
     async with async_session() as session:
-        report = await session.get(Report, report_id)
-        if report:
-            await session.delete(report)
-            await session.commit()
-            return True
-        return False
+        seeded = await session.scalar(
+            select(Counter.name).where(Counter.name == REPORTS_TOTAL)
+        )
+    if not seeded:
+        await reconcile_stats()
 
 
 # ── Ban CRUD ──────────────────────────────────────────────────────
 
+# In-process copy of banned_users. Loaded at startup, written through by
+# ban_user/unban_user once their transaction commits, and reloaded
+# periodically so replicas converge. Until the first load, is_banned
+# falls back to the database (a "miss").
+_ban_cache: set[int] | None = None
+_ban_cache_version = 0
+_ban_cache_stats = {"hits": 0, "misses": 0, "reloads": 0, "loaded_at": None}
 
-async def ban_user(user_id: int, banned_by: int, reason: str | None = None) -> BannedUser:
-    async with async_session() as session:
+
+@_timed
+async def load_ban_cache() -> int:
+    """(Re)load the ban set from the database. Returns its size."""
+    global _ban_cache
+    while True:
+        version = _ban_cache_version
+        async with async_session() as session:
+            result = await session.execute(select(BannedUser.user_id))
+            banned = set(result.scalars().all())
+        # A local ban/unban landed mid-query — reload so it isn't overwritten
+        if version == _ban_cache_version:
+            break
+
+    _ban_cache = banned
+    _ban_cache_stats["reloads"] += 1
+    _ban_cache_stats["loaded_at"] = datetime.now(timezone.utc)
+    return len(banned)
+
+
+def _update_ban_cache(user_id: int, banned: bool) -> None:
+    """Write a committed ban/unban through to the in-process set."""
+    global _ban_cache_version
+    _ban_cache_version += 1
+    if _ban_cache is not None:
+        if banned:
+            _ban_cache.add(user_id)
+        else:
+            _ban_cache.discard(user_id)
+
+
+def ban_cache_stats() -> dict:
+    """Hit/miss counters and size of the in-process ban set."""
+    return {**_ban_cache_stats, "size": len(_ban_cache) if _ban_cache is not None else None}
+
+
+@_timed
+async def ban_user(
+    user_id: int,
+    banned_by: int,
+    reason: str | None = None,
+    session: AsyncSession | None = None,
+) -> BannedUser:
+    async with _session(session) as session:
         banned = BannedUser(user_id=user_id, banned_by=banned_by, reason=reason)
         await session.merge(banned)
-        await session.commit()
-        return banned
+        await _commit(session)
+        _after_commit(session, lambda: _update_ban_cache(user_id, True))
+    return banned
 
 
-async def unban_user(user_id: int) -> bool:
-    async with async_session() as session:
+@_timed
+async def unban_user(user_id: int, session: AsyncSession | None = None) -> bool:
+    async with _session(session) as session:
         user = await session.get(BannedUser, user_id)
         if user:
             await session.delete(user)
-            await session.commit()
-            return True
-        return False
+            await _commit(session)
+            _after_commit(session, lambda: _update_ban_cache(user_id, False))
+    return user is not None
 
 
-async def is_banned(user_id: int) -> bool:
-    async with async_session() as session:
+async def is_banned(user_id: int, session: AsyncSession | None = None) -> bool:
+    if _ban_cache is not None:
+        _ban_cache_stats["hits"] += 1
+        return user_id in _ban_cache
+
+    _ban_cache_stats["misses"] += 1
+    async with _session(session) as session:
         user = await session.get(BannedUser, user_id)
         return user is not None
 
 
-async def get_banned_list() -> list[BannedUser]:
-    async with async_session() as session:
+@_timed
+async def get_banned_list(session: AsyncSession | None = None) -> list[BannedUser]:
+    async with _session(session) as session:
         result = await session.execute(
             select(BannedUser).order_by(BannedUser.banned_at.desc())
         )
@@ -229,15 +1366,17 @@ async def get_banned_list() -> list[BannedUser]:
 # ── Chat Record CRUD ─────────────────────────────────────────────
 
 
+@_timed
 async def upsert_chat(
     chat_id: int,
     chat_type: str,
     title: str | None = None,
     username: str | None = None,
     first_name: str | None = None,
+    session: AsyncSession | None = None,
 ) -> None:
     """Insert or update a chat record."""
-    async with async_session() as session:
+    async with _session(session) as session:
         existing = await session.get(ChatRecord, chat_id)
         if existing:
             existing.chat_type = chat_type
@@ -253,23 +1392,263 @@ async def upsert_chat(
                 username=username,
                 first_name=first_name,
             ))
-        await session.commit()
+        await _commit(session)
+
 
+@_timed
+async def upsert_chats(rows: list[dict], batch_size: int = 1000) -> None:
+    """
+    Bulk insert-or-update chat records (chat_id, chat_type, title, username).
 
-async def get_all_active_chats() -> list[ChatRecord]:
-    """Return all chats where bot is still active."""
+    One INSERT ... ON CONFLICT DO UPDATE per batch; re-activates the chat.
+    """
     async with async_session() as session:
+        for start in range(0, len(rows), batch_size):
+            stmt = _insert(ChatRecord).values(rows[start:start + batch_size])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ChatRecord.chat_id],
+                set_={
+                    "chat_type": stmt.excluded.chat_type,
+                    "title": stmt.excluded.title,
+                    "username": stmt.excluded.username,
+                    "is_active": True,
+                },
+            )
+            await session.execute(stmt)
+        await session.commit()
+
+
+@_timed
+async def count_active_chats_by_type(session: AsyncSession | None = None) -> dict[str, int]:
+    """Active chat counts keyed by chat_type (one GROUP BY, no row loading)."""
+    async with _session(session) as session:
         result = await session.execute(
-            select(ChatRecord).where(ChatRecord.is_active == True)
+            select(ChatRecord.chat_type, func.count())
+            .where(ChatRecord.is_active == True)
+            .group_by(ChatRecord.chat_type)
         )
-        return list(result.scalars().all())
+        return dict(result.all())
+
+
+async def iter_active_chats(
+    batch_size: int = 1000,
+    after: int | None = None,
+) -> AsyncIterator[list[tuple[int, str]]]:
+    """
+    Yield (chat_id, chat_type) of active chats in batches, by chat_id,
+    starting after chat_id `after` if given.
 
+    Each batch is its own short keyset query on the partial index rather
+    than one cursor held open for a whole broadcast (which would pin a
+    pooled connection and an old snapshot for hours). Memory stays at one
+    batch of tuples however many chats are tracked.
+    """
+    last_id = after
+    while True:
+        stmt = (
+            select(ChatRecord.chat_id, ChatRecord.chat_type)
+            .where(ChatRecord.is_active == True)
+            .order_by(ChatRecord.chat_id)
+            .limit(batch_size)
+        )
+        if last_id is not None:
+            stmt = stmt.where(ChatRecord.chat_id > last_id)
+
+        async with async_session() as session:
+            batch = [(chat_id, chat_type) for chat_id, chat_type in (await session.execute(stmt)).all()]
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1][0]
+
+
+@_timed
+async def deactivate_chats(chat_ids: list[int], session: AsyncSession | None = None) -> None:
+    """Mark many chats inactive in one UPDATE (a single array parameter on Postgres)."""
+    if not chat_ids:
+        return
+    async with _session(session) as session:
+        if _is_postgres():
+            condition = ChatRecord.chat_id == any_(bindparam("chat_ids", chat_ids, type_=ARRAY(BigInteger)))
+        else:
+            condition = ChatRecord.chat_id.in_(chat_ids)
+        await session.execute(update(ChatRecord).where(condition).values(is_active=False))
+        await _commit(session)
 
-async def deactivate_chat(chat_id: int) -> None:
+
+@_timed
+async def deactivate_chat(chat_id: int, session: AsyncSession | None = None) -> None:
     """Mark a chat as inactive (bot blocked/kicked)."""
-    async with async_session() as session:
+    async with _session(session) as session:
         chat = await session.get(ChatRecord, chat_id)
         if chat:
             chat.is_active = False
-            await session.commit()
+            await _commit(session)
+
+
 
+# ── Broadcast jobs ────────────────────────────────────────────────
+#
+# Like the channel post outbox, a running job is owned through a lease
+# (locked_until) that its sender renews on every flush; a job whose lease
+# ran out is taken over with FOR UPDATE SKIP LOCKED by any replica.
+
+
+@_timed
+async def create_broadcast_job(
+    from_chat_id: int,
+    message_id: int,
+    created_by: int,
+    total: int,
+    status_chat_id: int | None,
+    status_message_id: int | None,
+    lease: float,
+) -> BroadcastJob:
+    async with async_session() as session:
+        job = BroadcastJob(
+            from_chat_id=from_chat_id,
+            message_id=message_id,
+            created_by=created_by,
+            total=total,
+            status_chat_id=status_chat_id,
+            status_message_id=status_message_id,
+            locked_until=datetime.now(timezone.utc) + timedelta(seconds=lease),
+        )
+        session.add(job)
+        await session.commit()
+        return job
+
+
+@_timed
+async def claim_orphaned_broadcasts(lease: float) -> list[BroadcastJob]:
+    """
+    Take over running jobs whose lease ran out (sender crashed or stopped).
+    Their in-flight deliveries are marked unknown and counted as failed.
+    """
+    now = datetime.now(timezone.utc)
+    async with async_session() as session:
+        jobs = (await session.execute(
+            select(BroadcastJob)
+            .where(
+                BroadcastJob.status == "running",
+                or_(BroadcastJob.locked_until.is_(None), BroadcastJob.locked_until < now),
+            )
+            .with_for_update(skip_locked=True)
+        )).scalars().all()
+        for job in jobs:
+            result = await session.execute(
+                update(BroadcastDelivery)
+                .where(BroadcastDelivery.job_id == job.id, BroadcastDelivery.status == "pending")
+                .values(status="unknown")
+            )
+            job.failed += result.rowcount
+            job.locked_until = now + timedelta(seconds=lease)
+        await session.commit()
+        return jobs
+
+
+@_timed
+async def dispatch_broadcast_chats(job_id: int, chat_ids: list[int], lease: float) -> list[int]:
+    """
+    Record chats as pending and move the cursor past them, before they are
+    sent. Returns the chats not already delivered (or attempted) by this job.
+    """
+    async with async_session() as session:
+        result = await session.execute(
+            _insert(BroadcastDelivery)
+            .values([{"job_id": job_id, "chat_id": chat_id} for chat_id in chat_ids])
+            .on_conflict_do_nothing()
+            .returning(BroadcastDelivery.chat_id)
+        )
+        new = set(result.scalars().all())
+        await session.execute(
+            update(BroadcastJob)
+            .where(BroadcastJob.id == job_id)
+            .values(
+                cursor=max(chat_ids),
+                locked_until=datetime.now(timezone.utc) + timedelta(seconds=lease),
+            )
+        )
+        await session.commit()
+        return [chat_id for chat_id in chat_ids if chat_id in new]
+
+
+@_timed
+async def record_broadcast_results(
+    job_id: int,
+    results: dict[str, list[int]],
+    lease: float,
+    release: list[int] | None = None,
+) -> str | None:
+    """
+    Store outcomes ("sent"/"blocked"/"failed" -> chat_ids) with one UPDATE
+    per outcome, deactivate the blocked chats, bump the job's counters and
+    renew its lease. `release` lists pending chats that were never handed
+    to a sender; they are forgotten and the cursor moved back before them
+    so a resumed job sends them.
+
+    Returns the job's status, so a sender learns of a cancel made on
+    another replica.
+    """
+    async with async_session() as session:
+        for status, chat_ids in results.items():
+            if chat_ids:
+                await session.execute(
+                    update(BroadcastDelivery)
+                    .where(BroadcastDelivery.job_id == job_id, BroadcastDelivery.chat_id.in_(chat_ids))
+                    .values(status=status)
+                )
+        values = {
+            "sent": BroadcastJob.sent + len(results.get("sent", ())),
+            "blocked": BroadcastJob.blocked + len(results.get("blocked", ())),
+            "failed": BroadcastJob.failed + len(results.get("failed", ())),
+            "locked_until": datetime.now(timezone.utc) + timedelta(seconds=lease),
+        }
+        if release:
+            await session.execute(
+                delete(BroadcastDelivery)
+                .where(BroadcastDelivery.job_id == job_id, BroadcastDelivery.chat_id.in_(release))
+            )
+            # Chats between are skipped on resume: they already have deliveries
+            values["cursor"] = min(release) - 1
+        if results.get("blocked"):
+            await deactivate_chats(results["blocked"], session=session)
+        status = await session.scalar(
+            update(BroadcastJob)
+            .where(BroadcastJob.id == job_id)
+            .values(**values)
+            .returning(BroadcastJob.status)
+        )
+        await session.commit()
+        return status
+
+
+@_timed
+async def cancel_broadcast_job(job_id: int) -> bool:
+    """Mark a running job cancelled; its sender (on any replica) stops at its next flush."""
+    async with async_session() as session:
+        result = await session.execute(
+            update(BroadcastJob)
+            .where(BroadcastJob.id == job_id, BroadcastJob.status == "running")
+            .values(status="cancelled", finished_at=datetime.now(timezone.utc))
+        )
+        await session.commit()
+        return result.rowcount > 0
+
+
+@_timed
+async def finish_broadcast_job(job_id: int, status: str) -> BroadcastJob | None:
+    """
+    Mark a job done/cancelled, or hand it back (status "running") with its
+    lease expired. A job cancelled meanwhile stays cancelled.
+    """
+    async with async_session() as session:
+        job = await session.get(BroadcastJob, job_id)
+        if job and job.status == "running":
+            if status == "running":
+                job.locked_until = None
+            else:
+                job.status = status
+                job.finished_at = datetime.now(timezone.utc)
+            await session.commit()
+        return job
@@ -1,5 +1,6 @@
-"""Admin/Owner commands — ban, unban, delete reports."""
+"""Admin/Owner commands — ban, unban, delete/repost reports, duplicates, maintenance."""
 
+import html
 import logging
 import os
 
@@ -7,12 +8,26 @@ from telegram import Update
 from telegram.ext import CommandHandler, ContextTypes
 
 from bot.database import (
+    ban_cache_stats,
     ban_user,
+    commit_unit_of_work,
+    count_channel_posts_by_status,
+    db_stats,
     delete_report,
+    find_similar_screenshots,
     get_banned_list,
     get_report_by_id,
+    reconcile_stats,
     unban_user,
 )
+from bot.services.channel import post_report_to_channel
+from bot.services.chat_tracker import tracker_stats
+from bot.services.collage_cache import collage_cache_stats
+from bot.services.membership import membership_stats
+from bot.services.outbox import outbox_stats
+from bot.services.prefetch import prefetch_stats
+from bot.services.rate_limiter import rate_limiter_stats
+from bot.services.render_pool import RenderQueueFull, render_stats
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +62,7 @@ async def ban_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     reason = " ".join(context.args[1:]) if len(context.args) > 1 else None
 
     await ban_user(target_id, update.effective_user.id, reason)
+    await commit_unit_of_work()
 
     reason_text = f"\n📝 Sebab: {reason}" if reason else ""
     await update.message.reply_text(
@@ -76,6 +92,7 @@ async def unban_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         return
 
     success = await unban_user(target_id)
+    await commit_unit_of_work()
     if success:
         await update.message.reply_text(
             f"✅ User <code>{target_id}</code> telah di-unban.",
@@ -134,6 +151,10 @@ async def delete_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await update.message.reply_text(f"❌ Report #{report_id} tidak ditemui.")
         return
 
+    # Delete from database, committed before any Telegram call
+    await delete_report(report_id)
+    await commit_unit_of_work()
+
     # Delete from channel if posted
     if report.channel_message_id and CHANNEL_ID:
         try:
@@ -144,15 +165,225 @@ async def delete_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         except Exception as e:
             logger.warning(f"Failed to delete channel message: {e}")
 
-    # Delete from database
-    await delete_report(report_id)
     await update.message.reply_text(
-        f"✅ Report #{report_id:04d} (<b>{report.casino_name}</b>) telah dipadam.",
+        f"✅ Report #{report_id:04d} (<b>{html.escape(report.casino_name)}</b>) telah dipadam.",
         parse_mode="HTML",
     )
     logger.info(f"Report #{report_id} deleted by owner")
 
 
+async def repost_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Post a report to the channel again, replacing its old channel message."""
+    if not _is_owner(update.effective_user.id):
+        await update.message.reply_text("🚫 Arahan ini hanya untuk owner.")
+        return
+
+    if not context.args:
+        await update.message.reply_text(
+            "Guna: <code>/repost report_id</code>",
+            parse_mode="HTML",
+        )
+        return
+
+    try:
+        report_id = int(context.args[0])
+    except ValueError:
+        await update.message.reply_text("❌ Report ID mesti nombor.")
+        return
+
+    report = await get_report_by_id(report_id, with_screenshots=True)
+    if not report:
+        await update.message.reply_text(f"❌ Report #{report_id} tidak ditemui.")
+        return
+
+    old_message_id = report.channel_message_id
+    # Release the connection for the render and upload
+    await commit_unit_of_work()
+    try:
+        # Reuses the uploaded grid (or the cached collage) when available
+        await post_report_to_channel(context.bot, report)
+        await commit_unit_of_work()
+    except RenderQueueFull:
+        await update.message.reply_text("⏳ Sistem sibuk sekarang. Cuba lagi sebentar.")
+        return
+    except Exception:
+        await update.message.reply_text(f"❌ Gagal repost report #{report_id:04d}.")
+        return
+
+    if old_message_id and CHANNEL_ID:
+        try:
+            await context.bot.delete_message(chat_id=CHANNEL_ID, message_id=old_message_id)
+        except Exception as e:
+            logger.warning(f"Failed to delete old channel message: {e}")
+
+    await update.message.reply_text(f"✅ Report #{report_id:04d} telah di-repost ke channel.")
+    logger.info(f"Report #{report_id} reposted by owner")
+
+
+async def dupes_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """List other reports whose screenshots are near-duplicates of this report's."""
+    if not _is_owner(update.effective_user.id):
+        await update.message.reply_text("🚫 Arahan ini hanya untuk owner.")
+        return
+
+    if not context.args:
+        await update.message.reply_text(
+            "Guna: <code>/dupes report_id</code>",
+            parse_mode="HTML",
+        )
+        return
+
+    try:
+        report_id = int(context.args[0])
+    except ValueError:
+        await update.message.reply_text("❌ Report ID mesti nombor.")
+        return
+
+    report = await get_report_by_id(report_id, with_screenshots=True)
+    if not report:
+        await update.message.reply_text(f"❌ Report #{report_id} tidak ditemui.")
+        return
+
+    hashes = [s.get_phash() for s in report.screenshot_rows]
+    if not any(h is not None for h in hashes):
+        await update.message.reply_text(
+            f"ℹ️ Report #{report_id:04d} belum ada fingerprint screenshot."
+        )
+        return
+
+    matches = await find_similar_screenshots(hashes, exclude_report_id=report_id)
+    if not matches:
+        await update.message.reply_text(
+            f"✅ Tiada screenshot serupa untuk report #{report_id:04d}."
+        )
+        return
+
+    lines = [f"🔁 <b>Screenshot serupa — report #{report_id:04d}</b>\n"]
+    for m in matches[:30]:
+        lines.append(
+            f"• #{m['index'] + 1} ≈ report #{m['report_id']:04d} screenshot #{m['position'] + 1} "
+            f"({html.escape(m['casino_name'])}, user <code>{m['user_id']}</code>) — jarak {m['distance']}"
+        )
+    if len(matches) > 30:
+        lines.append(f"\n...dan {len(matches) - 30} lagi")
+    await update.message.reply_text("\n".join(lines), parse_mode="HTML")
+
+
+async def reconcile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Rebuild /stats counters from the reports table and show any drift."""
+    if not _is_owner(update.effective_user.id):
+        await update.message.reply_text("🚫 Arahan ini hanya untuk owner.")
+        return
+
+    result = await reconcile_stats()
+    drift = result["drift"]
+
+    lines = [
+        "🔄 <b>Statistik dibina semula</b>\n",
+        f"📋 Jumlah sebenar: <b>{result['total']}</b>",
+        f"💾 Jumlah tersimpan: <b>{result['stored_total'] or 0}</b>",
+    ]
+    if drift:
+        lines.append(f"\n⚠️ <b>{len(drift)} casino tidak sepadan:</b>")
+        for name, stored, live in drift[:20]:
+            lines.append(f"• {html.escape(name)}: {stored} → {live}")
+        if len(drift) > 20:
+            lines.append(f"… dan {len(drift) - 20} lagi")
+    else:
+        lines.append("\n✅ Tiada perbezaan.")
+
+    await update.message.reply_text("\n".join(lines), parse_mode="HTML")
+    logger.info(f"Stats reconciled: total={result['total']}, drift={len(drift)}")
+
+
+async def metrics_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show in-process cache and performance counters."""
+    if not _is_owner(update.effective_user.id):
+        await update.message.reply_text("🚫 Arahan ini hanya untuk owner.")
+        return
+
+    bans = ban_cache_stats()
+    loaded = bans["loaded_at"].strftime("%H:%M:%S UTC") if bans["loaded_at"] else "belum"
+    lines = [
+        "📈 <b>Metrics</b>\n",
+        "🚫 <b>Ban cache</b>",
+        f"• Saiz: {bans['size'] if bans['size'] is not None else 'N/A'}",
+        f"• Hit: {bans['hits']} | Miss: {bans['misses']}",
+        f"• Reload: {bans['reloads']} (terakhir {loaded})",
+    ]
+
+    members = membership_stats()
+    lines += [
+        "\n👤 <b>Membership cache</b>",
+        f"• Semakan: {members['checks']} | API dijimat: {members['saved']} ({members['hit_rate']:.0%})",
+        f"• Hit: {members['hits']} | Hit negatif: {members['negative_hits']} | "
+        f"Dikongsi: {members['shared']} | Miss: {members['misses']}",
+        f"• Panggilan API: {members['api_calls']} (ralat {members['errors']}) | Saiz: {members['size']}",
+    ]
+
+    chats = tracker_stats()
+    lines += [
+        "\n👥 <b>Group tracking (write-behind)</b>",
+        f"• Mesej: {chats['seen']} | Write dielak: {chats['skipped']}",
+        f"• Ditulis: {chats['written']} dalam {chats['flushes']} flush",
+        f"• Pending: {chats['pending']} | Ralat: {chats['errors']}",
+    ]
+
+    render = render_stats()
+    lines += [
+        "\n🖼 <b>Render pool</b>",
+        f"• Worker: {render['workers']} | Dalam queue: {render['pending']}/{render['limit']}",
+    ]
+
+    cache = collage_cache_stats()
+    lines += [
+        f"• Cache collage: {cache['hits']} hit, {cache['misses']} miss | "
+        f"{cache['bytes'] / 1048576:.1f}/{cache['limit'] / 1048576:.0f} MB, evict {cache['evicted']}",
+    ]
+
+    posts = await count_channel_posts_by_status()
+    box = outbox_stats()
+    lines += [
+        "\n📤 <b>Channel post outbox</b>",
+        f"• Menunggu: {posts.get('pending', 0)} | Gagal: {posts.get('failed', 0)} | "
+        f"Dipaparkan: {posts.get('posted', 0)}",
+        f"• Replica ini: {box['posted']} post, {box['retried']} retry, "
+        f"{box['deferred']} tangguh (render penuh), {box['failed']} gagal",
+    ]
+
+    pre = prefetch_stats()
+    lines += [
+        "\n📥 <b>Screenshot prefetch</b>",
+        f"• Perbualan: {pre['conversations']} | Memori: {pre['bytes'] / 1048576:.1f}/{pre['limit'] / 1048576:.0f} MB",
+        f"• Hit: {pre['hits']} | Miss: {pre['misses']} | Dimulakan: {pre['started']}",
+        f"• Evict: {pre['evicted']} | Tamat tempoh: {pre['expired']} | Lebih had: {pre['over_cap']}",
+    ]
+
+    limits = rate_limiter_stats()
+    lines += [
+        "\n🚦 <b>Rate limiter</b>",
+        f"• Panggilan: {limits['calls']} | Ditahan: {limits['delayed']} "
+        f"({limits['delayed_ratio']:.0%}, avg {limits['wait_avg_ms']:.0f}ms)",
+        f"• RetryAfter: {limits['retry_after']} (gagal {limits['gave_up']}) | "
+        f"Bucket chat: {limits['chat_buckets']}, dijeda {limits['paused_buckets']}",
+    ]
+
+    db = db_stats()
+    lines += [
+        "\n🗄 <b>Database pool</b>",
+        f"• Guna: {db.get('checked_out', '-')}/{db.get('pool_size', '-')} "
+        f"(overflow {db.get('overflow', '-')}, {db.get('saturation', 0):.0%} penuh)",
+        f"• Tunggu checkout: avg {db['wait_avg_ms']:.1f}ms | max {db['wait_max_ms']:.1f}ms",
+        f"• Sambungan baru: {db['connects']} (avg {db['connect_avg_ms']:.1f}ms | max {db['connect_max_ms']:.1f}ms)",
+        f"• Timeout: {db['timeouts']}",
+    ]
+    slowest = sorted(db["queries"].items(), key=lambda kv: -kv[1]["avg_ms"])[:5]
+    for name, q in slowest:
+        lines.append(f"• <code>{name}</code>: {q['calls']}x, avg {q['avg_ms']:.1f}ms, max {q['max_ms']:.1f}ms")
+
+    await update.message.reply_text("\n".join(lines), parse_mode="HTML")
+
+
 def get_admin_handlers() -> list:
     """Return handlers for admin module."""
     return [
@@ -160,4 +391,8 @@ def get_admin_handlers() -> list:
         CommandHandler("unban", unban_command),
         CommandHandler("banlist", banlist_command),
         CommandHandler("delete", delete_command),
+        CommandHandler("repost", repost_command),
+        CommandHandler("dupes", dupes_command),
+        CommandHandler("reconcile", reconcile_command),
+        CommandHandler("metrics", metrics_command),
     ]
@@ -1,14 +1,13 @@
 """Broadcast handler — owner-only, forward message to all tracked chats."""
 
-import asyncio
 import logging
 import os
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
-from telegram.error import Forbidden, BadRequest, TimedOut, NetworkError
 from telegram.ext import CallbackQueryHandler, CommandHandler, ContextTypes
 
-from bot.database import deactivate_chat, get_all_active_chats
+from bot.database import count_active_chats_by_type
+from bot.services import broadcast
 
 logger = logging.getLogger(__name__)
 
@@ -39,16 +38,16 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         return
 
-    # Get active chats count
-    chats = await get_all_active_chats()
-    if not chats:
+    # Count active chats by type
+    counts = await count_active_chats_by_type()
+    total = sum(counts.values())
+    if not total:
         await update.message.reply_text("❌ Tiada chat aktif dalam database.")
         return
 
-    # Count by type
-    private_count = sum(1 for c in chats if c.chat_type == "private")
-    group_count = sum(1 for c in chats if c.chat_type in ("group", "supergroup"))
-    channel_count = sum(1 for c in chats if c.chat_type == "channel")
+    private_count = counts.get("private", 0)
+    group_count = counts.get("group", 0) + counts.get("supergroup", 0)
+    channel_count = counts.get("channel", 0)
 
     # Store the message to broadcast in context
     context.user_data["broadcast_msg_id"] = update.message.reply_to_message.message_id
@@ -67,7 +66,7 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         f"👤 Users: <b>{private_count}</b>\n"
         f"👥 Groups: <b>{group_count}</b>\n"
         f"📣 Channels: <b>{channel_count}</b>\n"
-        f"📊 Jumlah: <b>{len(chats)}</b>\n\n"
+        f"📊 Jumlah: <b>{total}</b>\n\n"
         f"Teruskan?",
         parse_mode="HTML",
         reply_markup=InlineKeyboardMarkup(keyboard),
@@ -91,49 +90,45 @@ async def broadcast_confirm_callback(
         await query.edit_message_text("❌ Sesi broadcast tamat. Sila cuba semula.")
         return
 
-    # Update message to show progress
-    await query.edit_message_text("📢 Broadcasting... Sila tunggu ⏳")
-
-    chats = await get_all_active_chats()
-    success = 0
-    failed = 0
-    blocked = 0
-
-    for chat in chats:
-        try:
-            await context.bot.copy_message(
-                chat_id=chat.chat_id,
-                from_chat_id=from_chat_id,
-                message_id=msg_id,
-            )
-            success += 1
-            # Small delay to avoid flood limits
-            await asyncio.sleep(0.05)
-        except Forbidden:
-            # Bot blocked or kicked
-            await deactivate_chat(chat.chat_id)
-            blocked += 1
-        except (BadRequest, TimedOut, NetworkError) as e:
-            logger.warning(f"Broadcast fail for {chat.chat_id}: {e}")
-            failed += 1
-        except Exception as e:
-            logger.error(f"Broadcast unexpected error for {chat.chat_id}: {e}")
-            failed += 1
-
+    counts = await count_active_chats_by_type()
     # Clean up context
     context.user_data.pop("broadcast_msg_id", None)
     context.user_data.pop("broadcast_chat_id", None)
 
-    # Send summary
+    # Sent in the background by the broadcast engine, which edits this
+    # message with progress and, when it's done, the summary
+    job_id = await broadcast.start(
+        context.bot,
+        from_chat_id=from_chat_id,
+        message_id=msg_id,
+        created_by=query.from_user.id,
+        total=sum(counts.values()),
+        status_chat_id=query.message.chat_id,
+        status_message_id=query.message.message_id,
+    )
     await query.edit_message_text(
-        f"📢 <b>Broadcast Selesai!</b>\n\n"
-        f"✅ Berjaya: <b>{success}</b>\n"
-        f"🚫 Blocked/Kicked: <b>{blocked}</b>\n"
-        f"❌ Gagal: <b>{failed}</b>\n"
-        f"📊 Jumlah: <b>{success + failed + blocked}</b>",
-        parse_mode="HTML",
+        "📢 Broadcasting... Sila tunggu ⏳",
+        reply_markup=broadcast.stop_keyboard(job_id),
     )
-    logger.info(f"Broadcast done: {success} ok, {blocked} blocked, {failed} failed")
+    logger.info(f"Broadcast #{job_id} started by owner")
+
+
+async def broadcast_stop_callback(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> None:
+    """Handle the ⛔ Stop button of a running broadcast."""
+    query = update.callback_query
+
+    if not _is_owner(query.from_user.id):
+        await query.answer()
+        return
+
+    job_id = int(query.data.split(":", 1)[1])
+    if await broadcast.cancel(job_id):
+        await query.answer("⛔ Broadcast dihentikan. Mesej yang sedang dihantar akan diselesaikan.")
+        logger.info(f"Broadcast #{job_id} stopped by owner")
+    else:
+        await query.answer("Broadcast ini dah tamat.")
 
 
 async def broadcast_cancel_callback(
@@ -158,4 +153,5 @@ def get_broadcast_handlers() -> list:
         CommandHandler("broadcast", broadcast_command),
         CallbackQueryHandler(broadcast_confirm_callback, pattern=r"^broadcast_confirm$"),
         CallbackQueryHandler(broadcast_cancel_callback, pattern=r"^broadcast_cancel$"),
+        CallbackQueryHandler(broadcast_stop_callback, pattern=r"^broadcast_stop:\d+$"),
     ]
@@ -1,7 +1,8 @@
 """Report conversation handler — step-by-step scam report submission."""
 
+import asyncio
+import html
 import logging
-import os
 
 from telegram import (
     InlineKeyboardButton,
@@ -17,8 +18,15 @@ from telegram.ext import (
     filters,
 )
 
-from bot.database import create_report, is_banned
-from bot.services.channel import post_report_to_channel
+from bot.database import (
+    commit_unit_of_work,
+    create_report,
+    find_similar_screenshots,
+    is_banned,
+)
+from bot.services import outbox, prefetch
+from bot.services.channel import pick_photo_size, tile_file_ids
+from bot.services.collage import CELL_SIZE
 from bot.services.membership import NOT_JOINED_TEXT, get_join_keyboard, is_member_of_all
 
 logger = logging.getLogger(__name__)
@@ -26,6 +34,33 @@ logger = logging.getLogger(__name__)
 # Conversation states
 CASINO_NAME, CASINO_LINK, AMOUNT_LOST, DESCRIPTION, SCREENSHOTS, CONFIRM = range(6)
 
+# How long the preview waits for in-flight prefetches to be fingerprinted
+PHASH_WAIT = 3  # seconds
+# How long prefetches still downloading after confirm are waited for
+# before the outbox worker is left to fetch the screenshots itself
+PREFETCH_WAIT = 10  # seconds
+MAX_DUPE_LINES = 5
+
+
+def _prefetch_key(update: Update) -> prefetch.ConversationKey:
+    return update.effective_chat.id, update.effective_user.id
+
+
+def _tile_file_ids(screenshots: list[dict]) -> list[str]:
+    """The variants the channel collage will use, given the final screenshot count."""
+    return tile_file_ids([shot.get("sizes") or [{"file_id": shot["file_id"]}] for shot in screenshots])
+
+
+async def _hand_off_prefetched(key: prefetch.ConversationKey, report_id: int) -> None:
+    """Pass prefetched screenshots to the outbox, giving up on downloads stuck after PREFETCH_WAIT."""
+    try:
+        prefetched = await asyncio.wait_for(prefetch.collect(key), timeout=PREFETCH_WAIT)
+    except asyncio.TimeoutError:
+        logger.warning(f"Prefetched screenshots not ready after {PREFETCH_WAIT}s, leaving them to the outbox")
+        prefetch.drop(key)
+        prefetched = {}
+    outbox.hand_off(report_id, prefetched)
+
 
 async def report_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Start the report conversation."""
@@ -48,6 +83,7 @@ async def report_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
         )
         return ConversationHandler.END
 
+    prefetch.drop(_prefetch_key(update))
     context.user_data.clear()
     context.user_data["screenshots"] = []
 
@@ -136,9 +172,25 @@ async def receive_description(update: Update, context: ContextTypes.DEFAULT_TYPE
 async def receive_screenshot(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Receive a screenshot photo."""
     if update.message.photo:
-        # Get highest resolution photo
+        # Keep every size Telegram made; the largest describes the photo
+        sizes = [
+            {"file_id": p.file_id, "width": p.width, "height": p.height, "file_size": p.file_size}
+            for p in update.message.photo
+        ]
         photo = update.message.photo[-1]
-        context.user_data["screenshots"].append(photo.file_id)
+        context.user_data["screenshots"].append({
+            "file_id": photo.file_id,
+            "file_unique_id": photo.file_unique_id,
+            "width": photo.width,
+            "height": photo.height,
+            "file_size": photo.file_size,
+            "sizes": sizes,
+        })
+        # Start downloading now so confirm doesn't have to wait for it —
+        # the size a grid cell needs, which most layouts use; the preview
+        # adds any other size the final layout picks
+        cell = pick_photo_size(sizes, CELL_SIZE, CELL_SIZE)
+        prefetch.start(context.bot, _prefetch_key(update), cell["file_id"])
 
         count = len(context.user_data["screenshots"])
         await update.message.reply_text(
@@ -162,14 +214,54 @@ async def done_screenshots(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 
 async def skip_screenshots(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Skip screenshots."""
+    prefetch.drop(_prefetch_key(update))
     context.user_data["screenshots"] = []
     return await _show_preview(update, context)
 
 
+async def _attach_phashes(update: Update, screenshots: list[dict], timeout: float) -> list[int | None]:
+    """Copy prefetch fingerprints onto the screenshot dicts; returns them in order."""
+    known = await prefetch.hashes(_prefetch_key(update), timeout=timeout)
+    for shot in screenshots:
+        if shot.get("phash") is None and shot.get("sizes"):
+            cell = pick_photo_size(shot["sizes"], CELL_SIZE, CELL_SIZE)
+            shot["phash"] = known.get(cell["file_id"])
+    return [shot.get("phash") for shot in screenshots]
+
+
+def _format_dupes(matches: list[dict]) -> str:
+    """Preview warning listing earlier reports with near-identical screenshots."""
+    seen = set()
+    lines = []
+    for m in matches:
+        if (m["index"], m["report_id"]) in seen:
+            continue
+        seen.add((m["index"], m["report_id"]))
+        lines.append(
+            f"• Screenshot #{m['index'] + 1} ≈ laporan #{m['report_id']:04d} "
+            f"({html.escape(m['casino_name'])})"
+        )
+    more = len(lines) - MAX_DUPE_LINES
+    text = "\n⚠️ <b>Screenshot serupa pernah dilaporkan:</b>\n" + "\n".join(lines[:MAX_DUPE_LINES])
+    if more > 0:
+        text += f"\n• ...dan {more} lagi"
+    return text + "\n"
+
+
 async def _show_preview(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Show report preview for confirmation."""
     data = context.user_data
-    ss_count = len(data.get("screenshots", []))
+    screenshots = data.get("screenshots", [])
+    ss_count = len(screenshots)
+
+    # The count is final now: fetch the variants a single-image or 3-image
+    # layout needs beyond the grid cells already prefetched
+    for file_id in _tile_file_ids(screenshots):
+        prefetch.start(context.bot, _prefetch_key(update), file_id)
+
+    # Flag evidence that was already used in other reports
+    hashes = await _attach_phashes(update, screenshots, timeout=PHASH_WAIT)
+    dupes = await find_similar_screenshots(hashes) if any(h is not None for h in hashes) else []
 
     preview = (
         "📋 <b>Preview Laporan:</b>\n\n"
@@ -183,8 +275,10 @@ async def _show_preview(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
     preview += (
         f"\n📝 <b>Keterangan:</b>\n{data['description']}\n"
         f"\n📸 <b>Screenshot:</b> {ss_count} gambar\n"
-        f"\n<b>Sahkan untuk hantar?</b>"
     )
+    if dupes:
+        preview += _format_dupes(dupes)
+    preview += "\n<b>Sahkan untuk hantar?</b>"
 
     keyboard = [
         [
@@ -208,6 +302,7 @@ async def confirm_report(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     if query.data == "confirm_no":
         await query.edit_message_text("❌ Laporan dibatalkan.")
+        prefetch.drop(_prefetch_key(update))
         context.user_data.clear()
         return ConversationHandler.END
 
@@ -218,6 +313,9 @@ async def confirm_report(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     await query.edit_message_text("⏳ Menghantar laporan...")
 
     try:
+        # Fingerprints that became ready since the preview; the channel post
+        # computes any still missing
+        await _attach_phashes(update, data.get("screenshots", []), timeout=0)
         report = await create_report(
             user_id=user.id,
             username=user.username,
@@ -226,27 +324,28 @@ async def confirm_report(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             casino_link=data.get("casino_link"),
             amount_lost=data.get("amount_lost"),
             description=data["description"],
-            screenshot_ids=data.get("screenshots", []),
+            screenshots=data.get("screenshots", []),
+            post_to_channel=True,
+            notify_chat_id=query.message.chat_id,
         )
-
-        # Post to channel
-        channel_msg_id = await post_report_to_channel(context.bot, report)
-
-        # Build "View in Channel" button if possible
-        channel_invite = os.getenv("CHANNEL_INVITE", "")
-        reply_markup = None
-        if channel_msg_id and channel_invite:
-            post_link = f"{channel_invite}/{channel_msg_id}"
-            reply_markup = InlineKeyboardMarkup([
-                [InlineKeyboardButton("📢 Lihat di Channel", url=post_link)]
-            ])
+        # The outbox worker posts it, reusing screenshots downloaded during
+        # the conversation; announced before the job is visible to it
+        outbox.expect(report.id)
+        try:
+            # Report and its channel post job become durable together
+            await commit_unit_of_work()
+        except Exception:
+            outbox.withdraw(report.id)
+            raise
+        outbox.wake()
+        # Acknowledge first; downloads still running finish in the background
+        context.application.create_task(_hand_off_prefetched(_prefetch_key(update), report.id), update=update)
 
         await query.message.reply_text(
-            f"✅ <b>Laporan #{report.id:04d} berjaya dihantar!</b>\n\n"
-            "Laporan anda telah dipaparkan di channel. "
-            "Terima kasih kerana membantu komuniti! 🙏",
+            f"📥 <b>Laporan #{report.id:04d} diterima!</b>\n\n"
+            "Laporan anda dah disimpan dan akan dipaparkan di channel "
+            "sebentar lagi — kami akan maklumkan.",
             parse_mode="HTML",
-            reply_markup=reply_markup,
         )
 
     except Exception as e:
@@ -262,6 +361,7 @@ async def confirm_report(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 async def cancel_report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Cancel the report conversation."""
+    prefetch.drop(_prefetch_key(update))
     context.user_data.clear()
     await update.message.reply_text("❌ Laporan dibatalkan.", parse_mode="HTML")
     return ConversationHandler.END
@@ -1,9 +1,94 @@
 """Search, check, and stats handlers."""
 
-from telegram import Update
-from telegram.ext import CommandHandler, ContextTypes
+import html
+import secrets
+from datetime import datetime, timezone
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import CallbackQueryHandler, CommandHandler, ContextTypes
+
+from bot.database import (
+    check_link,
+    count_link_reports,
+    count_search_results,
+    get_stats,
+    search_reports,
+)
+from bot.services.domains import normalize_domain
+
+
+# ── Pagination ────────────────────────────────────────────────────
+#
+# Buttons carry "page:<kind>:<token>:<n|p>:<cursor>". The token points at
+# the query stored in chat_data (callback_data is capped at 64 bytes);
+# the cursor is the (created_at, id) of the edge row, hex-encoded.
+
+PAGE_SIZE = 10
+_MAX_PAGERS = 20  # queries remembered per chat
+
+
+def _encode_cursor(report) -> str:
+    created = report.created_at
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    micros = int(created.timestamp()) * 1_000_000 + created.microsecond
+    return f"{micros:x}-{report.id:x}"
+
+
+def _decode_cursor(value: str) -> tuple[datetime, int]:
+    micros, report_id = (int(part, 16) for part in value.split("-"))
+    created = datetime.fromtimestamp(micros // 1_000_000, timezone.utc)
+    return created.replace(microsecond=micros % 1_000_000), report_id
+
+
+def _remember_query(context: ContextTypes.DEFAULT_TYPE, kind: str, query: str, total: int) -> str:
+    pagers = context.chat_data.setdefault("pagers", {})
+    token = secrets.token_hex(3)
+    pagers[token] = {"kind": kind, "query": query, "total": total}
+    while len(pagers) > _MAX_PAGERS:
+        pagers.pop(next(iter(pagers)))
+    return token
+
+
+def _page_keyboard(
+    kind: str, token: str, reports: list, has_prev: bool, has_next: bool
+) -> InlineKeyboardMarkup | None:
+    buttons = []
+    if has_prev:
+        buttons.append(InlineKeyboardButton(
+            "⬅️ Sebelum", callback_data=f"page:{kind}:{token}:p:{_encode_cursor(reports[0])}"
+        ))
+    if has_next:
+        buttons.append(InlineKeyboardButton(
+            "Seterus ➡️", callback_data=f"page:{kind}:{token}:n:{_encode_cursor(reports[-1])}"
+        ))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
+
+
+def _format_search_page(query: str, total: int, reports: list) -> str:
+    lines = [f"🔍 <b>Hasil Carian: {html.escape(query)}</b> ({total} laporan)\n"]
+    for r in reports:
+        link_info = f" | 🔗 {html.escape(r.casino_link)}" if r.casino_link else ""
+        amount_info = f" | 💰 RM{html.escape(r.amount_lost)}" if r.amount_lost else ""
+        date = r.created_at.strftime("%d/%m/%Y") if r.created_at else "N/A"
+        lines.append(
+            f"#{r.id:04d} — <b>{html.escape(r.casino_name)}</b>{link_info}{amount_info} | 📅 {date}"
+        )
+    return "\n".join(lines)
+
+
+def _format_check_page(link: str, total: int, reports: list) -> str:
+    lines = [f"⚠️ <b>Link {html.escape(link)} dah kena report {total} kali!</b>\n"]
+    for r in reports:
+        date = r.created_at.strftime("%d/%m/%Y") if r.created_at else "N/A"
+        lines.append(f"#{r.id:04d} — <b>{html.escape(r.casino_name)}</b> | 📅 {date}")
+    return "\n".join(lines)
 
-from bot.database import check_link, get_stats, search_reports
+
+_PAGE_SOURCES = {
+    "s": (search_reports, _format_search_page),
+    "c": (check_link, _format_check_page),
+}
 
 
 async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -17,25 +102,22 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
 
     query = " ".join(context.args)
-    reports = await search_reports(query)
+    reports, has_next = await search_reports(query, limit=PAGE_SIZE)
 
     if not reports:
         await update.message.reply_text(
-            f"❌ Tiada laporan ditemui untuk <b>{query}</b>.",
+            f"❌ Tiada laporan ditemui untuk <b>{html.escape(query)}</b>.",
             parse_mode="HTML",
         )
         return
 
-    lines = [f"🔍 <b>Hasil Carian: {query}</b>\n"]
-    for r in reports:
-        link_info = f" | 🔗 {r.casino_link}" if r.casino_link else ""
-        amount_info = f" | 💰 RM{r.amount_lost}" if r.amount_lost else ""
-        date = r.created_at.strftime("%d/%m/%Y") if r.created_at else "N/A"
-        lines.append(
-            f"#{r.id:04d} — <b>{r.casino_name}</b>{link_info}{amount_info} | 📅 {date}"
-        )
-
-    await update.message.reply_text("\n".join(lines), parse_mode="HTML")
+    total = await count_search_results(query)
+    token = _remember_query(context, "s", query, total)
+    await update.message.reply_text(
+        _format_search_page(query, total, reports),
+        parse_mode="HTML",
+        reply_markup=_page_keyboard("s", token, reports, False, has_next),
+    )
 
 
 async def check_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -48,22 +130,63 @@ async def check_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         )
         return
 
-    link = " ".join(context.args)
-    reports = await check_link(link)
+    link = normalize_domain(" ".join(context.args))
+    if not link:
+        await update.message.reply_text(
+            "❌ Link tidak sah.\n"
+            "Contoh: <code>/check hgbt.bet</code>",
+            parse_mode="HTML",
+        )
+        return
+
+    reports, has_next = await check_link(link, limit=PAGE_SIZE)
 
     if not reports:
         await update.message.reply_text(
-            f"✅ Link <b>{link}</b> belum ada dalam database laporan.",
+            f"✅ Link <b>{html.escape(link)}</b> belum ada dalam database laporan.",
             parse_mode="HTML",
         )
         return
 
-    lines = [f"⚠️ <b>Link {link} dah kena report {len(reports)} kali!</b>\n"]
-    for r in reports:
-        date = r.created_at.strftime("%d/%m/%Y") if r.created_at else "N/A"
-        lines.append(f"#{r.id:04d} — <b>{r.casino_name}</b> | 📅 {date}")
+    total = await count_link_reports(link)
+    token = _remember_query(context, "c", link, total)
+    await update.message.reply_text(
+        _format_check_page(link, total, reports),
+        parse_mode="HTML",
+        reply_markup=_page_keyboard("c", token, reports, False, has_next),
+    )
 
-    await update.message.reply_text("\n".join(lines), parse_mode="HTML")
+
+async def page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle ⬅️/➡️ buttons under /search and /check results."""
+    query = update.callback_query
+    try:
+        _, kind, token, direction, cursor = query.data.split(":")
+        cursor = _decode_cursor(cursor)
+    except (ValueError, OverflowError, OSError):
+        # Stale button from an older layout, or crafted data
+        cursor = None
+
+    pager = context.chat_data.get("pagers", {}).get(token) if cursor else None
+    # The stored query decides what is fetched; the button only has to agree
+    if not pager or pager["kind"] != kind or direction not in ("n", "p"):
+        await query.answer("⌛ Sesi carian tamat. Sila cari semula.", show_alert=True)
+        return
+    await query.answer()
+
+    fetch, render = _PAGE_SOURCES[pager["kind"]]
+    backward = direction == "p"
+    reports, has_more = await fetch(pager["query"], cursor=cursor, backward=backward, limit=PAGE_SIZE)
+    if not reports:
+        await query.edit_message_reply_markup(reply_markup=None)
+        return
+
+    has_prev, has_next = (has_more, True) if backward else (True, has_more)
+    await query.edit_message_text(
+        render(pager["query"], pager["total"], reports),
+        parse_mode="HTML",
+        reply_markup=_page_keyboard(kind, token, reports, has_prev, has_next),
+    )
 
 
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -79,7 +202,7 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         text += "\n🏆 <b>Top 5 Casino Paling Banyak Report:</b>\n"
         for i, (name, count) in enumerate(stats["top_casinos"], 1):
             medal = ["🥇", "🥈", "🥉", "4️⃣", "5️⃣"][i - 1]
-            text += f"{medal} <b>{name}</b> — {count} laporan\n"
+            text += f"{medal} <b>{html.escape(name)}</b> — {count} laporan\n"
     else:
         text += "\nBelum ada laporan lagi."
 
@@ -96,4 +219,5 @@ def get_search_handlers() -> list:
         CommandHandler("search", search_command),
         CommandHandler("check", check_command),
         CommandHandler("stats", stats_command),
+        CallbackQueryHandler(page_callback, pattern=r"^page:"),
     ]
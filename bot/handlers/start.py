@@ -6,7 +6,7 @@ from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import CallbackQueryHandler, CommandHandler, ContextTypes
 
 from bot.services.membership import is_member_of_all, get_join_keyboard, NOT_JOINED_TEXT
-from bot.database import upsert_chat
+from bot.database import commit_unit_of_work, upsert_chat
 
 WELCOME_VIDEO_PATH = Path(__file__).resolve().parent.parent.parent / "assets" / "welcome.mp4"
 
@@ -58,6 +58,8 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         username=user.username,
         first_name=user.first_name,
     )
+    # Don't hold the connection through the video upload
+    await commit_unit_of_work()
 
     keyboard = [
         [InlineKeyboardButton("📝 Buat Laporan", callback_data="start_report")],
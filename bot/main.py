@@ -1,5 +1,6 @@
 """Main entry point — bot startup with webhook (self-signed SSL)."""
 
+import asyncio
 import logging
 import os
 import subprocess
@@ -9,12 +10,24 @@ from dotenv import load_dotenv
 from telegram import ChatMemberUpdated, Update
 from telegram.ext import Application, ChatMemberHandler, ContextTypes, MessageHandler, filters
 
-from bot.database import deactivate_chat, init_db, upsert_chat
+from bot.database import (
+    backfill_domain_keys,
+    db_stats,
+    deactivate_chat,
+    ensure_stats,
+    init_db,
+    load_ban_cache,
+    migrate_legacy_screenshots,
+    unit_of_work,
+    upsert_chat,
+)
 from bot.handlers.admin import get_admin_handlers
 from bot.handlers.broadcast import get_broadcast_handlers
 from bot.handlers.report import get_report_handler
 from bot.handlers.search import get_search_handlers
 from bot.handlers.start import get_start_handlers
+from bot.services import broadcast, chat_tracker, outbox, prefetch, render_pool
+from bot.services.rate_limiter import rate_limiter
 
 load_dotenv()
 
@@ -23,6 +36,8 @@ BOT_TOKEN = os.getenv("BOT_TOKEN", "")
 WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
 WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
 PORT = int(os.getenv("PORT", "8443"))
+BAN_CACHE_REFRESH = int(os.getenv("BAN_CACHE_REFRESH", "60"))  # seconds
+DB_STATS_INTERVAL = int(os.getenv("DB_STATS_INTERVAL", "300"))  # seconds, 0 to disable
 
 CERT_DIR = Path("/app/certs")
 CERT_FILE = CERT_DIR / "cert.pem"
@@ -36,6 +51,22 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class UnitOfWorkApplication(Application):
+    """
+    Runs each update's handlers inside one DB unit of work (single commit).
+
+    Handlers commit it early (commit_unit_of_work) before talking to
+    Telegram; a failed final commit goes to the error handlers.
+    """
+
+    async def process_update(self, update: object) -> None:
+        try:
+            async with unit_of_work():
+                await super().process_update(update)
+        except Exception as e:
+            await self.process_error(update=update, error=e)
+
+
 def _generate_self_signed_cert() -> None:
     """Generate self-signed SSL certificate for webhook."""
     CERT_DIR.mkdir(parents=True, exist_ok=True)
@@ -73,7 +104,21 @@ async def post_init(application: Application) -> None:
     """Initialize database after bot starts."""
     logger.info("Initializing database...")
     await init_db()
-    logger.info("Database ready!")
+    await ensure_stats()
+    banned = await load_ban_cache()
+    logger.info(f"Database ready! ({banned} banned users cached)")
+
+    await render_pool.start()
+
+    # Backfills and cache refreshes run in the background so startup isn't blocked
+    _spawn(_run_backfills(), "backfills")
+    _spawn(_refresh_ban_cache(), "ban-cache-refresh")
+    _spawn(_flush_chat_tracker(), "chat-tracker-flush")
+    _spawn(_sweep_prefetch(), "prefetch-sweep")
+    _spawn(outbox.run(application.bot), "channel-post-outbox")
+    _spawn(_resume_broadcasts(application), "broadcast-resume")
+    if DB_STATS_INTERVAL > 0:
+        _spawn(_log_db_stats(), "db-stats-log")
 
     # Set bot commands
     await application.bot.set_my_commands([
@@ -88,6 +133,117 @@ async def post_init(application: Application) -> None:
     logger.info("Bot commands set!")
 
 
+async def post_stop(application: Application) -> None:
+    """Flush write-behind buffers once no more updates are processed."""
+    # Stop claiming broadcasts first, so none is resumed after the hand-back
+    await _cancel_background("broadcast-resume")
+    # Hand running broadcasts back while the bot can still finish its sends
+    await broadcast.stop_all()
+    written = await chat_tracker.flush()
+    logger.info(f"Flushed {written} pending chat records")
+
+
+async def post_shutdown(application: Application) -> None:
+    """Stop background loops and worker processes started in post_init."""
+    tasks = list(_background_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    prefetch.drop_all()
+    render_pool.shutdown()
+
+
+# ── Background tasks ─────────────────────────────────────────────
+
+# Long-running loops live outside Application.create_task, which would make
+# Application.stop() wait for them forever.
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _spawn(coro, name: str) -> asyncio.Task:
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _cancel_background(name: str) -> None:
+    tasks = [task for task in _background_tasks if task.get_name() == name]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _refresh_ban_cache() -> None:
+    """Periodically reload the ban set so bans made on other replicas apply here."""
+    while True:
+        await asyncio.sleep(BAN_CACHE_REFRESH)
+        try:
+            await load_ban_cache()
+        except Exception as e:
+            logger.warning(f"Ban cache refresh failed: {e}")
+
+
+async def _flush_chat_tracker() -> None:
+    """Write coalesced group-tracking changes every CHAT_FLUSH_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(chat_tracker.FLUSH_INTERVAL)
+        await chat_tracker.flush()
+
+
+async def _sweep_prefetch() -> None:
+    """Drop screenshot prefetches of abandoned report conversations."""
+    while True:
+        await asyncio.sleep(prefetch.SWEEP_INTERVAL)
+        expired = prefetch.sweep()
+        if expired:
+            logger.info(f"Dropped prefetched screenshots of {expired} idle report conversations")
+
+
+async def _resume_broadcasts(application: Application) -> None:
+    """Continue broadcasts interrupted by a restart, here or on a dead replica."""
+    while True:
+        try:
+            await broadcast.resume_orphaned(application.bot)
+        except Exception as e:
+            logger.warning(f"Resuming broadcasts failed: {e}")
+        await asyncio.sleep(broadcast.RESUME_INTERVAL)
+
+
+async def _log_db_stats() -> None:
+    """Log pool saturation and the slowest CRUD functions periodically."""
+    while True:
+        await asyncio.sleep(DB_STATS_INTERVAL)
+        stats = db_stats()
+        slowest = sorted(stats["queries"].items(), key=lambda kv: -kv[1]["avg_ms"])[:3]
+        logger.info(
+            "DB pool: %s/%s checked out (overflow %s), checkout wait avg %.1fms max %.1fms, "
+            "%s connects avg %.1fms, %s timeouts | slowest: %s",
+            stats.get("checked_out", "-"),
+            stats.get("pool_size", "-"),
+            stats.get("overflow", "-"),
+            stats["wait_avg_ms"],
+            stats["wait_max_ms"],
+            stats["connects"],
+            stats["connect_avg_ms"],
+            stats["timeouts"],
+            ", ".join(f"{name} {q['avg_ms']:.1f}ms" for name, q in slowest) or "-",
+        )
+
+
+async def _run_backfills() -> None:
+    """Backfill derived columns for rows created by older versions."""
+    try:
+        count = await backfill_domain_keys()
+        if count:
+            logger.info(f"Backfilled domain_key for {count} reports")
+        count = await migrate_legacy_screenshots()
+        if count:
+            logger.info(f"Migrated screenshots of {count} reports to report_screenshots")
+    except Exception as e:
+        logger.error(f"Backfill failed: {e}")
+
+
 # ── Auto-tracking helpers ────────────────────────────────────────
 
 
@@ -108,6 +264,7 @@ async def _track_bot_status(update: Update, context: ContextTypes.DEFAULT_TYPE)
         logger.info(f"Bot added to {chat.type} '{chat.title}' ({chat.id})")
     elif new_status in ("left", "kicked"):
         # Bot removed from chat
+        await chat_tracker.forget_chats([chat.id])
         await deactivate_chat(chat.id)
         logger.info(f"Bot removed from {chat.type} '{chat.title}' ({chat.id})")
 
@@ -116,7 +273,8 @@ async def _track_group_message(update: Update, context: ContextTypes.DEFAULT_TYP
     """Passively track groups the bot is already in when messages arrive."""
     chat = update.effective_chat
     if chat and chat.type in ("group", "supergroup"):
-        await upsert_chat(
+        # Buffered — only changed chats are written, in periodic batches
+        chat_tracker.track_chat(
             chat_id=chat.id,
             chat_type=chat.type,
             title=chat.title,
@@ -129,8 +287,19 @@ def main() -> None:
     if not BOT_TOKEN:
         raise ValueError("BOT_TOKEN env var is required!")
 
-    builder = Application.builder().token(BOT_TOKEN)
-    application = builder.post_init(post_init).build()
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .application_class(UnitOfWorkApplication)
+        # Every Bot API call shares the flood-limit buckets
+        .rate_limiter(rate_limiter)
+    )
+    application = (
+        builder.post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Register handlers
     for handler in get_start_handlers():
@@ -0,0 +1,314 @@
+"""Broadcast engine — persisted, resumable jobs copying a message to every active chat."""
+
+import asyncio
+import logging
+import os
+import time
+
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, Forbidden, NetworkError, TimedOut
+
+from bot.database import (
+    BroadcastJob,
+    cancel_broadcast_job,
+    claim_orphaned_broadcasts,
+    create_broadcast_job,
+    dispatch_broadcast_chats,
+    finish_broadcast_job,
+    iter_active_chats,
+    record_broadcast_results,
+)
+from bot.services import chat_tracker
+from bot.services.rate_limiter import BULK
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("BROADCAST_WORKERS", "8"))
+DISPATCH_CHUNK = 50  # chats recorded as pending per write; bounds what a crash can leave unknown
+FLUSH_INTERVAL = 1.0  # seconds between outcome writes
+STOP_TIMEOUT = 10  # seconds senders get to finish their current send on shutdown
+PROGRESS_INTERVAL = 5  # seconds between status message edits
+LEASE = 120  # seconds a job stays owned without a flush
+RESUME_INTERVAL = 60  # seconds between checks for orphaned jobs
+
+# job_id -> (sender task, its progress) on this replica
+_running: dict[int, tuple[asyncio.Task, "_Progress"]] = {}
+# While stop_all() runs, jobs launched meanwhile are handed straight back
+_stopping = False
+
+
+async def start(
+    bot: Bot,
+    from_chat_id: int,
+    message_id: int,
+    created_by: int,
+    total: int,
+    status_chat_id: int | None = None,
+    status_message_id: int | None = None,
+) -> int:
+    """Create a broadcast job and start sending it in the background. Returns its id."""
+    job = await create_broadcast_job(
+        from_chat_id, message_id, created_by, total, status_chat_id, status_message_id, LEASE
+    )
+    _launch(bot, job)
+    return job.id
+
+
+def _launch(bot: Bot, job: BroadcastJob) -> None:
+    progress = _Progress(job)
+    task = asyncio.create_task(_run(bot, job, progress), name=f"broadcast-{job.id}")
+    _running[job.id] = (task, progress)
+    task.add_done_callback(lambda _: _running.pop(job.id, None))
+    if _stopping:
+        progress.stop()
+
+
+async def resume_orphaned(bot: Bot) -> int:
+    """Continue running jobs no replica is sending; returns how many."""
+    jobs = await claim_orphaned_broadcasts(LEASE)
+    for job in jobs:
+        logger.info(f"Resuming broadcast #{job.id} after chat {job.cursor}")
+        _launch(bot, job)
+    return len(jobs)
+
+
+async def cancel(job_id: int) -> bool:
+    """Stop a broadcast for good (the ⛔ Stop button). False if it already ended."""
+    cancelled = await cancel_broadcast_job(job_id)
+    running = _running.get(job_id)
+    if running:
+        running[1].stop(cancelled=True)
+    return cancelled
+
+
+async def stop_all() -> None:
+    """Hand running jobs back (for another replica or the next start) and wait."""
+    global _stopping
+    _stopping = True
+    try:
+        # Loop: a claim already in flight may still launch a job while we wait
+        while _running:
+            tasks = []
+            for task, progress in _running.values():
+                progress.stop()
+                tasks.append(task)
+            # Senders finish the send they're in; only stragglers are cut off
+            # (and their chats end up "unknown")
+            _, late = await asyncio.wait(tasks, timeout=STOP_TIMEOUT)
+            for task in late:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        _stopping = False
+
+
+class _Progress:
+    """
+    Outcomes not yet written, chats dispatched but not yet taken by a
+    sender, and running totals for the status message.
+    """
+
+    def __init__(self, job: BroadcastJob) -> None:
+        self.results: dict[str, list[int]] = {"sent": [], "blocked": [], "failed": []}
+        self.queued: set[int] = set()
+        self.stopping = False
+        self.cancelled = False
+        # Totals include what earlier runs of a resumed job did
+        self.totals = {"sent": job.sent, "blocked": job.blocked, "failed": job.failed}
+        self.started = time.monotonic()
+        self.done_here = 0
+
+    def stop(self, cancelled: bool = False) -> None:
+        self.stopping = True
+        self.cancelled = self.cancelled or cancelled
+
+    def add(self, status: str, chat_id: int) -> None:
+        self.results[status].append(chat_id)
+        self.totals[status] += 1
+        self.done_here += 1
+
+    def take(self) -> dict[str, list[int]]:
+        results = self.results
+        self.results = {"sent": [], "blocked": [], "failed": []}
+        return results
+
+    def put_back(self, results: dict[str, list[int]]) -> None:
+        for status, chat_ids in results.items():
+            self.results[status].extend(chat_ids)
+
+
+async def _run(bot: Bot, job: BroadcastJob, progress: _Progress) -> None:
+    queue: asyncio.Queue[int | None] = asyncio.Queue(maxsize=DISPATCH_CHUNK)
+    senders = [asyncio.create_task(_send_loop(bot, job, queue, progress)) for _ in range(WORKERS)]
+    stopped = asyncio.Event()
+    flusher = asyncio.create_task(_flush_loop(bot, job, progress, stopped))
+    status = "running"
+    try:
+        await _dispatch(job, queue, progress)
+        if progress.stopping:
+            # Not taken yet: stays in progress.queued and is released below
+            while not queue.empty():
+                queue.get_nowait()
+        for _ in senders:
+            await queue.put(None)
+        await asyncio.gather(*senders)
+        if progress.cancelled:
+            status = "cancelled"
+        elif not progress.stopping:
+            status = "done"
+        else:
+            logger.info(f"Broadcast #{job.id} stopped, handing it back")
+    except asyncio.CancelledError:
+        logger.info(f"Broadcast #{job.id} interrupted, handing it back")
+        raise
+    except Exception as e:
+        logger.error(f"Broadcast #{job.id} stopped: {e}")
+    finally:
+        for task in senders:
+            task.cancel()
+        stopped.set()
+        await asyncio.gather(flusher, *senders, return_exceptions=True)
+        # Final write; shielded so shutdown doesn't lose the last outcomes
+        await asyncio.shield(_finish(bot, job, progress, status))
+
+
+async def _dispatch(job: BroadcastJob, queue: asyncio.Queue, progress: _Progress) -> None:
+    """Feed the senders every active chat after the job's cursor, until done or stopping."""
+    async for batch in iter_active_chats(after=job.cursor):
+        for i in range(0, len(batch), DISPATCH_CHUNK):
+            if progress.stopping:
+                return
+            chunk = [chat_id for chat_id, _ in batch[i:i + DISPATCH_CHUNK]]
+            chunk = await dispatch_broadcast_chats(job.id, chunk, LEASE)
+            progress.queued.update(chunk)
+            for chat_id in chunk:
+                if progress.stopping:
+                    return
+                await queue.put(chat_id)
+
+
+async def _send_loop(bot: Bot, job: BroadcastJob, queue: asyncio.Queue, progress: _Progress) -> None:
+    while True:
+        chat_id = await queue.get()
+        if chat_id is None or progress.stopping:
+            return
+        progress.queued.discard(chat_id)
+        try:
+            await bot.copy_message(
+                chat_id=chat_id,
+                from_chat_id=job.from_chat_id,
+                message_id=job.message_id,
+                rate_limit_args=BULK,
+            )
+            progress.add("sent", chat_id)
+        except Forbidden:
+            # Bot blocked or kicked; deactivated in bulk with the next flush
+            progress.add("blocked", chat_id)
+        except (BadRequest, TimedOut, NetworkError) as e:
+            logger.warning(f"Broadcast fail for {chat_id}: {e}")
+            progress.add("failed", chat_id)
+        except Exception as e:
+            logger.error(f"Broadcast unexpected error for {chat_id}: {e}")
+            progress.add("failed", chat_id)
+
+
+async def _flush_loop(bot: Bot, job: BroadcastJob, progress: _Progress, stopped: asyncio.Event) -> None:
+    # Stopped by the event rather than cancelled, so a write is never cut off
+    # halfway; _finish writes whatever is left
+    last_edit = 0.0
+    while not stopped.is_set():
+        try:
+            await asyncio.wait_for(stopped.wait(), FLUSH_INTERVAL)
+            return
+        except TimeoutError:
+            pass
+        results = progress.take()
+        try:
+            status = await _record(job, results)
+        except Exception as e:
+            progress.put_back(results)
+            logger.warning(f"Saving broadcast #{job.id} progress failed: {e}")
+        else:
+            if status == "cancelled" and not progress.cancelled:
+                logger.info(f"Broadcast #{job.id} cancelled elsewhere, stopping")
+                progress.stop(cancelled=True)
+
+        if time.monotonic() - last_edit >= PROGRESS_INTERVAL and not progress.stopping:
+            last_edit = time.monotonic()
+            await _edit_status(bot, job, _progress_text(job, progress), stop_button=True)
+
+
+async def _record(job: BroadcastJob, results: dict[str, list[int]], release: list[int] | None = None) -> str | None:
+    """record_broadcast_results(); blocked chats are forgotten by the tracker first so they can come back."""
+    await chat_tracker.forget_chats(results["blocked"])
+    return await record_broadcast_results(job.id, results, LEASE, release=release)
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+def _progress_text(job: BroadcastJob, progress: _Progress) -> str:
+    totals = progress.totals
+    done = sum(totals.values())
+    rate = progress.done_here / max(time.monotonic() - progress.started, 1e-6)
+    remaining = max(job.total - done, 0)
+    eta = _format_duration(remaining / rate) if rate > 0 else "-"
+    percent = done / job.total * 100 if job.total else 100.0
+    return (
+        f"📢 <b>Broadcasting...</b> ⏳\n\n"
+        f"✅ Berjaya: <b>{totals['sent']}</b>\n"
+        f"🚫 Blocked/Kicked: <b>{totals['blocked']}</b>\n"
+        f"❌ Gagal: <b>{totals['failed']}</b>\n"
+        f"📊 {done}/{job.total} ({percent:.0f}%)\n"
+        f"⚡ {rate:.1f} mesej/s | ⏱ Baki: {eta}"
+    )
+
+
+def stop_keyboard(job_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("⛔ Stop", callback_data=f"broadcast_stop:{job_id}")]
+    ])
+
+
+async def _edit_status(bot: Bot, job: BroadcastJob, text: str, stop_button: bool = False) -> None:
+    if not (job.status_chat_id and job.status_message_id):
+        return
+    try:
+        await bot.edit_message_text(
+            chat_id=job.status_chat_id,
+            message_id=job.status_message_id,
+            text=text,
+            parse_mode="HTML",
+            reply_markup=stop_keyboard(job.id) if stop_button else None,
+        )
+    except BadRequest as e:
+        # "message is not modified" when nothing changed since the last edit
+        logger.debug(f"Broadcast #{job.id} status not edited: {e}")
+    except Exception as e:
+        logger.warning(f"Couldn't update broadcast #{job.id} status message: {e}")
+
+
+async def _finish(bot: Bot, job: BroadcastJob, progress: _Progress, status: str) -> None:
+    # Chats dispatched but never taken are released so a resumed job sends them
+    await _record(job, progress.take(), release=list(progress.queued))
+    job = await finish_broadcast_job(job.id, status)
+    if job is None or job.status == "running":
+        return
+
+    logger.info(
+        f"Broadcast #{job.id} {job.status}: {job.sent} ok, {job.blocked} blocked, {job.failed} failed"
+    )
+    title = "⛔ <b>Broadcast Dihentikan</b>" if job.status == "cancelled" else "📢 <b>Broadcast Selesai!</b>"
+    await _edit_status(
+        bot,
+        job,
+        f"{title}\n\n"
+        f"✅ Berjaya: <b>{job.sent}</b>\n"
+        f"🚫 Blocked/Kicked: <b>{job.blocked}</b>\n"
+        f"❌ Gagal: <b>{job.failed}</b>\n"
+        f"📊 Jumlah: <b>{job.sent + job.failed + job.blocked}</b>"
+        + (f" daripada {job.total}" if job.status == "cancelled" else ""),
+    )
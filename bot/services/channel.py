@@ -1,14 +1,18 @@
 """Auto-post reports to Telegram channel."""
 
+import asyncio
 import io
 import logging
 import os
 from datetime import timezone
 
 from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, NetworkError, RetryAfter
 
-from bot.database import Report, update_report_channel_msg
-from bot.services.collage import create_grid_collage
+from bot.database import Report, set_screenshot_hashes, update_report_channel_msg
+from bot.services import collage_cache, render_pool
+from bot.services.collage import output_filename, tile_boxes
+from bot.services.render_pool import RenderQueueFull
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +21,11 @@ BOT_USERNAME = os.getenv("BOT_USERNAME", "")
 CHANNEL_INVITE = os.getenv("CHANNEL_INVITE", "")
 GROUP_INVITE = os.getenv("GROUP_INVITE", "")
 
+# Screenshot downloads: parallel per report, each attempt bounded in time
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "4"))
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", "20"))
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "2"))
+
 
 def _format_report_caption(report: Report) -> str:
     """Build the formatted channel post caption."""
@@ -97,41 +106,136 @@ def _get_promo_keyboard() -> InlineKeyboardMarkup | None:
     return InlineKeyboardMarkup([buttons])
 
 
-async def post_report_to_channel(bot: Bot, report: Report) -> int | None:
-    """Post a report to the configured Telegram channel."""
+def pick_photo_size(sizes: list[dict], width: int, height: int, fit: bool = False) -> dict:
+    """
+    Smallest PhotoSize that fills a width x height tile without upscaling:
+    covering it, or (fit=True) filling the largest variant's fitted size.
+    Falls back to the largest when dimensions are unknown or none is enough.
+    """
+    known = sorted(
+        (s for s in sizes if s.get("width") and s.get("height")),
+        key=lambda s: s["width"] * s["height"],
+    )
+    if not known:
+        return sizes[-1]
+    largest = known[-1]
+    if fit:
+        scale = min(width / largest["width"], height / largest["height"], 1.0)
+        width, height = int(largest["width"] * scale), int(largest["height"] * scale)
+    for size in known:
+        if size["width"] >= width and size["height"] >= height:
+            return size
+    return largest
+
+
+def tile_file_ids(all_sizes: list[list[dict]]) -> list[str]:
+    """Per screenshot (its PhotoSizes), the file_id of the smallest variant its collage tile needs."""
+    boxes = tile_boxes(len(all_sizes)) if all_sizes else []
+    return [pick_photo_size(sizes, *box)["file_id"] for sizes, box in zip(all_sizes, boxes)]
+
+
+def screenshot_file_ids(report: Report) -> list[str]:
+    """tile_file_ids() for a saved report."""
+    return tile_file_ids(report.get_screenshot_sizes())
+
+
+async def _download_file(bot: Bot, file_id: str) -> bytes:
+    """get_file + download_to_memory for a single screenshot."""
+    file = await bot.get_file(file_id)
+    buf = io.BytesIO()
+    await file.download_to_memory(buf)
+    return buf.getvalue()
+
+
+async def _download_with_retry(bot: Bot, file_id: str, sem: asyncio.Semaphore) -> bytes | None:
+    """Download one screenshot, retrying transient errors; None if it can't be fetched."""
+    async with sem:
+        for attempt in range(DOWNLOAD_RETRIES + 1):
+            try:
+                return await asyncio.wait_for(_download_file(bot, file_id), DOWNLOAD_TIMEOUT)
+            except RetryAfter as e:
+                delay = float(e.retry_after)
+            except BadRequest as e:
+                # Expired/invalid file_id — retrying won't help
+                logger.warning(f"Failed to download screenshot {file_id}: {e}")
+                return None
+            except (NetworkError, asyncio.TimeoutError):
+                delay = 2 ** attempt
+            except Exception as e:
+                logger.warning(f"Failed to download screenshot {file_id}: {e}")
+                return None
+            if attempt < DOWNLOAD_RETRIES:
+                await asyncio.sleep(delay)
+        logger.warning(f"Failed to download screenshot {file_id} after {DOWNLOAD_RETRIES + 1} attempts")
+        return None
+
+
+async def download_screenshots(
+    bot: Bot,
+    file_ids: list[str],
+    cached: dict[str, bytes] | None = None,
+) -> list[bytes]:
+    """
+    Download screenshots concurrently (at most DOWNLOAD_CONCURRENCY at once).
+
+    Files already in `cached` (file_id -> bytes) are not downloaded again.
+    Result keeps the order of `file_ids`; screenshots that fail are skipped.
+    """
+    results = await _download_all(bot, file_ids, cached)
+    return [data for data in results if data is not None]
+
+
+async def _download_all(
+    bot: Bot,
+    file_ids: list[str],
+    cached: dict[str, bytes] | None = None,
+) -> list[bytes | None]:
+    """Like download_screenshots, but failures stay in place as None."""
+    cached = cached or {}
+    sem = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+
+    async def fetch(file_id: str) -> bytes | None:
+        if file_id in cached:
+            return cached[file_id]
+        return await _download_with_retry(bot, file_id, sem)
+
+    return list(await asyncio.gather(*(fetch(file_id) for file_id in file_ids)))
+
+
+async def post_report_to_channel(
+    bot: Bot,
+    report: Report,
+    prefetched: dict[str, bytes] | None = None,
+) -> int | None:
+    """
+    Post a report to the configured Telegram channel.
+
+    `prefetched` maps file_id -> bytes for screenshots already downloaded.
+    A grid uploaded before (report.grid_image_id) is resent by file_id, and
+    collages are looked up in the disk cache before anything is downloaded.
+
+    Raises RenderQueueFull (before downloading anything) when the collage
+    has to be rendered and the render queue is saturated — the caller
+    should retry later.
+    """
     caption = _format_report_caption(report)
-    screenshot_ids = report.get_screenshots()
+    screenshot_ids = screenshot_file_ids(report)
     promo_kb = _get_promo_keyboard()
 
     try:
         if screenshot_ids:
-            # Download all screenshots and create grid collage
-            image_bytes_list: list[bytes] = []
-            for file_id in screenshot_ids:
+            # Uploaded before — Telegram resends it by file_id, no upload
+            if report.grid_image_id:
                 try:
-                    file = await bot.get_file(file_id)
-                    buf = io.BytesIO()
-                    await file.download_to_memory(buf)
-                    image_bytes_list.append(buf.getvalue())
-                except Exception as e:
-                    logger.warning(f"Failed to download screenshot {file_id}: {e}")
-
-            if image_bytes_list:
-                # Generate grid collage
-                grid_bytes = create_grid_collage(image_bytes_list)
+                    return await _send_grid(bot, report, report.grid_image_id, caption, promo_kb)
+                except BadRequest as e:
+                    logger.warning(f"Stored grid of report #{report.id} rejected, re-rendering: {e}")
+
+            grid_bytes = await _build_grid(bot, report, screenshot_ids, prefetched)
+            if grid_bytes:
                 grid_file = io.BytesIO(grid_bytes)
-                grid_file.name = "scam_report.jpg"
-
-                msg = await bot.send_photo(
-                    chat_id=CHANNEL_ID,
-                    photo=grid_file,
-                    caption=caption,
-                    parse_mode="HTML",
-                    reply_markup=promo_kb,
-                )
-                await update_report_channel_msg(report.id, msg.message_id)
-                logger.info(f"Report #{report.id} posted to channel with grid collage")
-                return msg.message_id
+                grid_file.name = output_filename()
+                return await _send_grid(bot, report, grid_file, caption, promo_kb)
 
         # No screenshots — send text only
         msg = await bot.send_message(
@@ -144,8 +248,70 @@ async def post_report_to_channel(bot: Bot, report: Report) -> int | None:
         logger.info(f"Report #{report.id} posted to channel (text only)")
         return msg.message_id
 
+    except RenderQueueFull:
+        raise
     except Exception as e:
         logger.error(f"Failed to post report #{report.id} to channel: {e}")
         raise
 
-    return None
+
+async def _build_grid(
+    bot: Bot,
+    report: Report,
+    screenshot_ids: list[str],
+    prefetched: dict[str, bytes] | None,
+) -> bytes | None:
+    """Collage bytes from the disk cache, or downloaded and rendered."""
+    unique_ids = report.get_screenshot_unique_ids()
+    key = collage_cache.cache_key(unique_ids) if unique_ids else None
+    if key:
+        cached = await collage_cache.get(key)
+        if cached:
+            return cached
+
+    # Raises RenderQueueFull before anything is downloaded
+    with render_pool.reserve():
+        # Download all screenshots and create grid collage
+        results = await _download_all(bot, screenshot_ids, prefetched)
+        positions = [i for i, data in enumerate(results) if data is not None]
+        image_bytes_list = [results[i] for i in positions]
+        del results
+        if not image_bytes_list:
+            return None
+
+        # A collage missing failed downloads isn't what the key describes
+        complete = len(image_bytes_list) == len(screenshot_ids)
+
+        # Generate grid collage (in a worker process); its decode also yields
+        # the screenshots' perceptual hashes
+        hashes: list[int | None] = []
+        grid_bytes = await render_pool.render_collage(image_bytes_list, hashes=hashes)
+    if key and complete:
+        await collage_cache.put(key, grid_bytes)
+    if report.needs_phashes():
+        await set_screenshot_hashes(
+            report.id, {positions[i]: h for i, h in enumerate(hashes) if h is not None}
+        )
+    return grid_bytes
+
+
+async def _send_grid(
+    bot: Bot,
+    report: Report,
+    photo: str | io.BytesIO,
+    caption: str,
+    promo_kb: InlineKeyboardMarkup | None,
+) -> int:
+    """Send the collage (bytes or a Telegram file_id) and remember its file_id."""
+    msg = await bot.send_photo(
+        chat_id=CHANNEL_ID,
+        photo=photo,
+        caption=caption,
+        parse_mode="HTML",
+        reply_markup=promo_kb,
+    )
+    grid_image_id = msg.photo[-1].file_id if msg.photo else None
+    await update_report_channel_msg(report.id, msg.message_id, grid_image_id)
+    report.grid_image_id = grid_image_id or report.grid_image_id
+    logger.info(f"Report #{report.id} posted to channel with grid collage")
+    return msg.message_id
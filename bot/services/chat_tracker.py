@@ -0,0 +1,89 @@
+"""Write-behind buffer for passive group tracking, flushed as one batched upsert."""
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+
+from bot.database import upsert_chats
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = float(os.getenv("CHAT_FLUSH_INTERVAL", "5"))  # seconds
+MAX_TRACKED = int(os.getenv("CHAT_TRACKER_MAX", "50000"))  # fingerprints kept (LRU)
+
+# chat_id -> (chat_type, title, username) last queued or written
+_seen: OrderedDict[int, tuple] = OrderedDict()
+# chat_id -> row waiting for the next flush
+_dirty: dict[int, dict] = {}
+_stats = {"seen": 0, "skipped": 0, "written": 0, "flushes": 0, "errors": 0}
+# Held while a batch is being written, so a chat forgotten meanwhile isn't
+# deactivated before the in-flight upsert marks it active again
+_flush_lock = asyncio.Lock()
+
+
+def track_chat(
+    chat_id: int,
+    chat_type: str,
+    title: str | None = None,
+    username: str | None = None,
+) -> None:
+    """Record activity in a chat; queues a write only if something changed."""
+    _stats["seen"] += 1
+    fingerprint = (chat_type, title, username)
+
+    if _seen.get(chat_id) == fingerprint:
+        _seen.move_to_end(chat_id)
+        _stats["skipped"] += 1
+        return
+
+    _seen[chat_id] = fingerprint
+    _seen.move_to_end(chat_id)
+    while len(_seen) > MAX_TRACKED:
+        _seen.popitem(last=False)
+
+    _dirty[chat_id] = {
+        "chat_id": chat_id,
+        "chat_type": chat_type,
+        "title": title,
+        "username": username,
+    }
+
+
+async def forget_chats(chat_ids: list[int]) -> None:
+    """
+    Drop any state for chats about to be deactivated (bot removed or
+    blocked), so their next message writes them — active — again. Call
+    before deactivating; waits for a flush in progress.
+    """
+    async with _flush_lock:
+        for chat_id in chat_ids:
+            _seen.pop(chat_id, None)
+            _dirty.pop(chat_id, None)
+
+
+async def flush() -> int:
+    """Write all queued chats in one batch. Returns rows written."""
+    if not _dirty:
+        return 0
+
+    async with _flush_lock:
+        rows = list(_dirty.values())
+        _dirty.clear()
+        try:
+            await upsert_chats(rows)
+        except Exception as e:
+            _stats["errors"] += 1
+            logger.warning(f"Chat flush failed ({len(rows)} rows), will retry: {e}")
+            for row in rows:
+                _dirty.setdefault(row["chat_id"], row)
+            return 0
+
+    _stats["written"] += len(rows)
+    _stats["flushes"] += 1
+    return len(rows)
+
+
+def tracker_stats() -> dict:
+    """Counters for /metrics — `skipped` is DB writes avoided."""
+    return {**_stats, "pending": len(_dirty), "tracked": len(_seen)}
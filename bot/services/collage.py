@@ -1,106 +1,350 @@
 """Grid collage generator using Pillow."""
 
 import io
+import logging
 import math
+import os
+
 from PIL import Image
 
+from bot.services.phash import dhash_image
+
+logger = logging.getLogger(__name__)
+
+# Speed/quality knobs. Fast decode lets libjpeg scale by 1/2, 1/4 or 1/8
+# while decoding (never below the cell size), so a 12 MP photo is never
+# fully decoded just to become an 800px tile.
+FAST_DECODE = os.getenv("COLLAGE_FAST_DECODE", "true").lower() in ("1", "true", "yes")
+_RESAMPLE_FILTERS = {
+    "lanczos": Image.Resampling.LANCZOS,
+    "bicubic": Image.Resampling.BICUBIC,
+    "bilinear": Image.Resampling.BILINEAR,
+}
+RESAMPLE = _RESAMPLE_FILTERS.get(
+    os.getenv("COLLAGE_RESAMPLE", "bicubic").lower(), Image.Resampling.BICUBIC
+)
+
+CELL_SIZE = 800
+BORDER = 4
+BG_COLOR = (30, 30, 30)
+SINGLE_MAX = 1600  # a lone screenshot is shown whole, fitted inside this box
+SINGLE_QUALITY = 90
+GRID_QUALITY = 92
+
+# Telegram sendPhoto limits
+TELEGRAM_MAX_BYTES = 10 * 1024 * 1024
+TELEGRAM_MAX_DIMENSIONS = 10000  # width + height
+TELEGRAM_MAX_RATIO = 20
+
+# Encoder budget. Telegram shows photos at most 2560px per side and
+# recompresses them anyway, so anything bigger only slows the upload.
+# Quality is binary-searched down (to MIN_QUALITY) until the file fits.
+FORMAT = "WEBP" if os.getenv("COLLAGE_FORMAT", "jpeg").lower() == "webp" else "JPEG"
+MAX_BYTES = min(int(os.getenv("COLLAGE_MAX_KB", "1024")) * 1024, TELEGRAM_MAX_BYTES)
+MAX_SIDE = int(os.getenv("COLLAGE_MAX_SIDE", "2560"))
+MIN_QUALITY = int(os.getenv("COLLAGE_MIN_QUALITY", "60"))
+OPTIMIZE = os.getenv("COLLAGE_OPTIMIZE", "true").lower() in ("1", "true", "yes")
+PROGRESSIVE = os.getenv("COLLAGE_PROGRESSIVE", "false").lower() in ("1", "true", "yes")
+_SHRINK_ATTEMPTS = 3
+
+# Upper bound on what one render may allocate for pixels (canvas + one
+# decoded source); sources that would exceed it are left out
+MEMORY_CAP = int(os.getenv("COLLAGE_MEMORY_MB", "192")) * 1024 * 1024
+
+# Bump when a code change alters the rendered output, so collages cached
+# by older code are not reused
+OUTPUT_VERSION = 3
+
+
+def output_params() -> dict:
+    """Everything besides the input images that determines the collage bytes."""
+    return {
+        "version": OUTPUT_VERSION,
+        "cell_size": CELL_SIZE,
+        "border": BORDER,
+        "fast_decode": FAST_DECODE,
+        "resample": RESAMPLE.name,
+        "format": FORMAT,
+        "max_bytes": MAX_BYTES,
+        "max_side": MAX_SIDE,
+        "min_quality": MIN_QUALITY,
+        "optimize": OPTIMIZE,
+        "progressive": PROGRESSIVE,
+        "memory_cap": MEMORY_CAP,
+    }
+
+
+def output_filename() -> str:
+    return "scam_report.webp" if FORMAT == "WEBP" else "scam_report.jpg"
+
+
+def tile_boxes(count: int, cell_size: int = CELL_SIZE, border: int = BORDER) -> list[tuple[int, int, bool]]:
+    """
+    Per input position, the (width, height, fit) box it is scaled into:
+    fit=False means scaled to cover the box and center-cropped, fit=True
+    means scaled down to fit inside it (the single-image layout).
+    """
+    if count == 1:
+        return [(SINGLE_MAX, SINGLE_MAX, True)]
+    boxes = [(cell_size, cell_size, False)] * count
+    if count == 3:
+        boxes[2] = (cell_size * 2 + border, cell_size, False)
+    return boxes
+
 
 def create_grid_collage(
     image_bytes_list: list[bytes],
-    cell_size: int = 800,
-    border: int = 4,
-    bg_color: tuple = (30, 30, 30),
+    cell_size: int = CELL_SIZE,
+    border: int = BORDER,
+    bg_color: tuple = BG_COLOR,
+    fast_decode: bool | None = None,
+    resample: Image.Resampling | None = None,
+    consume: bool = False,
+    hashes: list | None = None,
 ) -> bytes:
     """
-    Create a grid collage from multiple images.
+    Create a grid collage from multiple images, encoded within the budget.
+
+    Takes the same arguments as assemble_collage(). Returns JPEG (or WebP,
+    with COLLAGE_FORMAT=webp) bytes.
+    """
+    max_quality = SINGLE_QUALITY if len(image_bytes_list) == 1 else GRID_QUALITY
+    canvas = assemble_collage(
+        image_bytes_list, cell_size, border, bg_color, fast_decode, resample, consume, hashes
+    )
+    return encode_collage(canvas, max_quality, bg_color)
+
+
+def assemble_collage(
+    image_bytes_list: list[bytes],
+    cell_size: int = CELL_SIZE,
+    border: int = BORDER,
+    bg_color: tuple = BG_COLOR,
+    fast_decode: bool | None = None,
+    resample: Image.Resampling | None = None,
+    consume: bool = False,
+    hashes: list | None = None,
+) -> Image.Image:
+    """
+    Lay out multiple images as a grid collage.
+
+    The canvas is allocated first and sources are decoded, resized and
+    pasted one at a time, so peak memory is the canvas plus a single
+    decoded source. A source whose decode would push past MEMORY_CAP is
+    left out (its cell stays empty, a lone one gives an empty cell), like
+    a failed download.
 
     Args:
         image_bytes_list: List of image bytes
         cell_size: Size of each cell in pixels (square)
         border: Border/gap between cells in pixels
         bg_color: Background color (dark grey default)
+        fast_decode: Use JPEG draft (DCT-scaled) decoding; default FAST_DECODE
+        resample: Resize filter; default RESAMPLE (COLLAGE_RESAMPLE env)
+        consume: Empty `image_bytes_list` as it goes, releasing each source
+            right after use (for callers that own the list)
+        hashes: If given, receives each source's dHash in input order (None
+            for sources left out), computed from the decode done anyway
 
     Returns:
-        JPEG bytes of the grid collage
+        The collage as an RGB image
     """
     if not image_bytes_list:
         raise ValueError("No images provided")
-
-    # Single image — return as-is (just optimize)
-    if len(image_bytes_list) == 1:
-        img = Image.open(io.BytesIO(image_bytes_list[0]))
-        img = img.convert("RGB")
-        img.thumbnail((1600, 1600), Image.Resampling.LANCZOS)
-        buf = io.BytesIO()
-        img.save(buf, format="JPEG", quality=90)
-        return buf.getvalue()
+    if fast_decode is None:
+        fast_decode = FAST_DECODE
+    if resample is None:
+        resample = RESAMPLE
 
     count = len(image_bytes_list)
+    sources = _drain(image_bytes_list) if consume else iter(image_bytes_list)
+
+    # Single image — shown whole, just scaled down
+    if count == 1:
+        try:
+            img = _open_scaled(next(sources), SINGLE_MAX, SINGLE_MAX, fast_decode, fit=True, budget=MEMORY_CAP)
+        except MemoryError as e:
+            # Same as a left-out grid source: an empty cell
+            logger.warning(f"Leaving the screenshot out of the collage: {e}")
+            if hashes is not None:
+                hashes.append(None)
+            return Image.new("RGB", (cell_size, cell_size), bg_color)
+        if hashes is not None:
+            hashes.append(dhash_image(img))
+        img.thumbnail((SINGLE_MAX, SINGLE_MAX), resample)
+        return img
+
+    cols, rows = _grid_shape(count)
+    canvas_w = cell_size * cols + border * (cols + 1)
+    canvas_h = cell_size * rows + border * (rows + 1)
+    canvas = Image.new("RGB", (canvas_w, canvas_h), bg_color)
+    budget = MEMORY_CAP - canvas_w * canvas_h * 3
+
+    for i, ((box_w, box_h, _), data) in enumerate(zip(tile_boxes(count, cell_size, border), sources)):
+        try:
+            img = _open_scaled(data, box_w, box_h, fast_decode, budget=budget)
+        except MemoryError as e:
+            logger.warning(f"Leaving screenshot {i + 1} out of the collage: {e}")
+            if hashes is not None:
+                hashes.append(None)
+            continue
+        finally:
+            del data
+        if hashes is not None:
+            hashes.append(dhash_image(img))
+        tile = _resize_crop_center(img, box_w, box_h, resample)
+        del img
+        canvas.paste(tile, _tile_position(i, count, cols, cell_size, border))
+        del tile
+
+    return canvas
 
-    # Determine grid layout
+
+def _drain(items: list):
+    """Yield items in order, removing each from the list as it is handed out."""
+    items.reverse()
+    while items:
+        yield items.pop()
+
+
+def _grid_shape(count: int) -> tuple[int, int]:
+    """(cols, rows) of the grid for `count` images (2+)."""
     if count == 2:
-        cols, rows = 2, 1
-    elif count == 3:
-        cols, rows = 2, 2  # 2 on top, 1 full-width bottom
-    elif count == 4:
-        cols, rows = 2, 2
-    elif count <= 6:
-        cols, rows = 3, 2
-    elif count <= 9:
-        cols, rows = 3, 3
-    else:
-        cols = 3
-        rows = math.ceil(count / 3)
-
-    # Open & resize images to fit cells
-    images: list[Image.Image] = []
-    for img_bytes in image_bytes_list:
-        img = Image.open(io.BytesIO(img_bytes))
-        img = img.convert("RGB")
-        img = _resize_crop_center(img, cell_size, cell_size)
-        images.append(img)
-
-    # Special layout for 3 images: 2 top + 1 full-width bottom
-    if count == 3:
-        canvas_w = cell_size * 2 + border * 3
-        canvas_h = cell_size * 2 + border * 3
-        canvas = Image.new("RGB", (canvas_w, canvas_h), bg_color)
-
-        # Top row - 2 images
-        canvas.paste(images[0], (border, border))
-        canvas.paste(images[1], (border * 2 + cell_size, border))
-
-        # Bottom - 1 image full width
-        bottom_img = Image.open(io.BytesIO(image_bytes_list[2])).convert("RGB")
-        bottom_img = _resize_crop_center(bottom_img, cell_size * 2 + border, cell_size)
-        canvas.paste(bottom_img, (border, border * 2 + cell_size))
-    else:
-        # Standard grid
-        canvas_w = cell_size * cols + border * (cols + 1)
-        canvas_h = cell_size * rows + border * (rows + 1)
-        canvas = Image.new("RGB", (canvas_w, canvas_h), bg_color)
-
-        for i, img in enumerate(images):
-            row = i // cols
-            col = i % cols
-            x = border + col * (cell_size + border)
-            y = border + row * (cell_size + border)
-            canvas.paste(img, (x, y))
-
-    # Output
+        return 2, 1
+    if count <= 4:
+        return 2, 2  # 3 images: 2 on top, 1 full-width bottom
+    if count <= 6:
+        return 3, 2
+    return 3, math.ceil(count / 3)
+
+
+def _tile_position(index: int, count: int, cols: int, cell_size: int, border: int) -> tuple[int, int]:
+    """Top-left canvas coordinate of tile `index`."""
+    if count == 3 and index == 2:
+        # Full-width bottom tile of the 3-image layout
+        return border, border * 2 + cell_size
+    row, col = divmod(index, cols)
+    return border + col * (cell_size + border), border + row * (cell_size + border)
+
+
+def encode_collage(img: Image.Image, max_quality: int = GRID_QUALITY, bg_color: tuple = BG_COLOR) -> bytes:
+    """
+    Encode within Telegram's photo limits and the MAX_SIDE/MAX_BYTES budget:
+    the highest quality in [MIN_QUALITY, max_quality] that fits, found by
+    binary search. If even the lowest quality is too big the image is shrunk.
+    """
+    img = _fit_telegram_limits(img, bg_color)
+    min_quality = min(MIN_QUALITY, max_quality)
+    smallest = b""
+    for _ in range(_SHRINK_ATTEMPTS + 1):
+        data = _encode(img, max_quality)
+        if len(data) <= MAX_BYTES:
+            return data
+        smallest = data
+
+        fit = None
+        lo, hi = min_quality, max_quality - 1
+        while lo <= hi:
+            quality = (lo + hi) // 2
+            data = _encode(img, quality)
+            if len(data) <= MAX_BYTES:
+                fit = data
+                lo = quality + 1
+            else:
+                smallest = data
+                hi = quality - 1
+        if fit is not None:
+            return fit
+
+        # Over budget at MIN_QUALITY: bytes scale roughly with pixel count
+        scale = math.sqrt(MAX_BYTES / len(smallest)) * 0.95
+        img = img.resize(_fit_size(img.size, img.width * scale, img.height * scale), RESAMPLE)
+    return smallest
+
+
+def _encode(img: Image.Image, quality: int) -> bytes:
     buf = io.BytesIO()
-    canvas.save(buf, format="JPEG", quality=92)
+    if FORMAT == "WEBP":
+        # Fastest method: the quality search encodes several times
+        img.save(buf, format="WEBP", quality=quality, method=0)
+    else:
+        img.save(buf, format="JPEG", quality=quality, optimize=OPTIMIZE, progressive=PROGRESSIVE)
     return buf.getvalue()
 
 
-def _resize_crop_center(img: Image.Image, target_w: int, target_h: int) -> Image.Image:
+def _fit_telegram_limits(img: Image.Image, bg_color: tuple) -> Image.Image:
+    """Pad extreme aspect ratios and shrink to MAX_SIDE / Telegram's size limit."""
+    w, h = img.size
+    if max(w, h) > TELEGRAM_MAX_RATIO * min(w, h):
+        # Pad rather than crop — every part of a screenshot may be evidence
+        padded = Image.new("RGB", (max(w, h // TELEGRAM_MAX_RATIO), max(h, w // TELEGRAM_MAX_RATIO)), bg_color)
+        padded.paste(img, ((padded.width - w) // 2, (padded.height - h) // 2))
+        img, (w, h) = padded, padded.size
+
+    scale = min(MAX_SIDE / max(w, h), (TELEGRAM_MAX_DIMENSIONS - 1) / (w + h), 1.0)
+    if scale < 1.0:
+        img = img.resize((max(1, int(w * scale)), max(1, int(h * scale))), RESAMPLE)
+    return img
+
+
+def _fit_size(size: tuple[int, int], max_w: int, max_h: int) -> tuple[int, int]:
+    """Size of `size` scaled down to fit inside max_w x max_h."""
+    scale = min(max_w / size[0], max_h / size[1], 1.0)
+    return max(1, int(size[0] * scale)), max(1, int(size[1] * scale))
+
+
+def _cover_size(size: tuple[int, int], target_w: int, target_h: int) -> tuple[int, int]:
+    """Smallest size with `size`'s aspect that still covers target_w x target_h."""
+    scale = max(target_w / size[0], target_h / size[1])
+    return math.ceil(size[0] * scale), math.ceil(size[1] * scale)
+
+
+def _open_scaled(
+    data: bytes,
+    target_w: int,
+    target_h: int,
+    fast_decode: bool,
+    fit: bool = False,
+    budget: int | None = None,
+) -> Image.Image:
+    """
+    Open image bytes as RGB, letting JPEGs decode at a reduced scale.
+
+    Raises MemoryError (before decoding) when the decoded image would need
+    more than `budget` bytes.
+    """
+    img = Image.open(io.BytesIO(data))
+    if fast_decode:
+        # No-op for non-JPEG formats; JPEG picks the largest DCT scale
+        # whose output still covers the requested size
+        size = _fit_size(img.size, target_w, target_h) if fit else _cover_size(img.size, target_w, target_h)
+        img.draft("RGB", size)
+    if budget is not None:
+        # Native decode plus the RGB copy when a conversion is needed
+        bands = len(img.getbands()) + (0 if img.mode == "RGB" else 3)
+        needed = img.width * img.height * bands
+        if needed > budget:
+            raise MemoryError(f"{img.width}x{img.height} {img.mode} needs {needed >> 20} MB, budget {budget >> 20} MB")
+    if img.mode == "RGB":
+        # convert() would copy it, doubling what the budget allowed for
+        img.load()
+        return img
+    return img.convert("RGB")
+
+
+def _resize_crop_center(
+    img: Image.Image,
+    target_w: int,
+    target_h: int,
+    resample: Image.Resampling = Image.Resampling.LANCZOS,
+) -> Image.Image:
     """Resize and center-crop an image to exact dimensions."""
     # Calculate scale to fill target
     src_w, src_h = img.size
     scale = max(target_w / src_w, target_h / src_h)
-    new_w = int(src_w * scale)
-    new_h = int(src_h * scale)
-    img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
+    new_w = max(target_w, round(src_w * scale))
+    new_h = max(target_h, round(src_h * scale))
+    img = img.resize((new_w, new_h), resample)
 
     # Center crop
     left = (new_w - target_w) // 2
@@ -0,0 +1,139 @@
+"""Content-addressed collage cache on local disk, evicted least recently used first."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from bot.services.collage import output_filename, output_params
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path(os.getenv("COLLAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "scambot-collages")))
+MAX_BYTES = int(os.getenv("COLLAGE_CACHE_MAX_MB", "256")) * 1024 * 1024  # 0 disables
+# Every format the encoder can write; files of all of them count toward MAX_BYTES
+_SUFFIXES = (".jpg", ".webp")
+
+# path -> size, oldest use first; built lazily from the directory.
+# Disk I/O runs in worker threads, so the index is guarded by a lock.
+_lock = threading.Lock()
+_index: dict[Path, int] | None = None
+_total_bytes = 0
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0, "errors": 0}
+
+
+def cache_key(file_unique_ids: list[str]) -> str:
+    """
+    Key for a collage of these screenshots (in order) with the current
+    layout: sha256 of their file_unique_ids and output_params().
+    """
+    payload = json.dumps([file_unique_ids, output_params()], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _path(key: str) -> Path:
+    return (CACHE_DIR / key).with_suffix(Path(output_filename()).suffix)
+
+
+def _load_index() -> dict[Path, int]:
+    global _index, _total_bytes
+    if _index is None:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for path in CACHE_DIR.iterdir():
+            if path.suffix not in _SUFFIXES:
+                continue
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, path, st.st_size))
+        _index = {path: size for _, path, size in sorted(entries)}
+        _total_bytes = sum(_index.values())
+    return _index
+
+
+def _get(key: str) -> bytes | None:
+    with _lock:
+        return _get_locked(key)
+
+
+def _get_locked(key: str) -> bytes | None:
+    global _total_bytes
+    index = _load_index()
+    path = _path(key)
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    # Mark as most recently used (mtime survives restarts, atime may be off)
+    os.utime(path)
+    _total_bytes += len(data) - index.pop(path, 0)
+    index[path] = len(data)
+    return data
+
+
+def _put(key: str, data: bytes) -> None:
+    with _lock:
+        _put_locked(key, data)
+
+
+def _put_locked(key: str, data: bytes) -> None:
+    global _total_bytes
+    index = _load_index()
+    path = _path(key)
+    fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    _total_bytes += len(data) - index.pop(path, 0)
+    index[path] = len(data)
+
+    while _total_bytes > MAX_BYTES and index:
+        oldest = next(iter(index))
+        _total_bytes -= index.pop(oldest)
+        oldest.unlink(missing_ok=True)
+        _stats["evicted"] += 1
+
+
+async def get(key: str) -> bytes | None:
+    """Cached collage bytes, or None."""
+    if MAX_BYTES <= 0:
+        return None
+    try:
+        data = await asyncio.to_thread(_get, key)
+    except OSError as e:
+        _stats["errors"] += 1
+        logger.warning(f"Collage cache read failed: {e}")
+        return None
+    _stats["hits" if data is not None else "misses"] += 1
+    return data
+
+
+async def put(key: str, data: bytes) -> None:
+    """Store a rendered collage; failures are logged, never raised."""
+    if MAX_BYTES <= 0:
+        return
+    try:
+        await asyncio.to_thread(_put, key, data)
+        _stats["stores"] += 1
+    except OSError as e:
+        _stats["errors"] += 1
+        logger.warning(f"Collage cache write failed: {e}")
+
+
+def collage_cache_stats() -> dict:
+    return {
+        **_stats,
+        "files": len(_index) if _index is not None else None,
+        "bytes": _total_bytes,
+        "limit": MAX_BYTES,
+    }
@@ -0,0 +1,54 @@
+"""Casino link normalization — canonical domains for /check lookups."""
+
+from urllib.parse import urlsplit
+
+
+def normalize_domain(link: str | None) -> str | None:
+    """
+    Reduce a user-typed link to its canonical domain.
+
+    "https://WWW.HGBT.bet/register?ref=x" -> "hgbt.bet". Scheme, `www.`,
+    port, path, query and case are stripped; IDN hosts are punycoded.
+    Returns None when no usable host can be extracted.
+    """
+    if not link:
+        return None
+    link = link.strip().lower()
+    if not link:
+        return None
+    if "://" not in link:
+        link = f"http://{link}"
+
+    try:
+        host = urlsplit(link).hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+
+    host = host.strip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    if not host:
+        return None
+
+    try:
+        return host.encode("idna").decode("ascii")
+    except UnicodeError:
+        return None
+
+
+def domain_key(domain: str) -> str:
+    """
+    Reverse domain labels: "m.hgbt.bet" -> "bet.hgbt.m".
+
+    Subdomains share the parent's key as a prefix, so a suffix match on the
+    domain becomes an index-friendly prefix range scan on the key.
+    """
+    return ".".join(reversed(domain.split(".")))
+
+
+def link_domain_key(link: str | None) -> str | None:
+    """Shortcut: normalize a raw link straight to its domain key."""
+    domain = normalize_domain(link)
+    return domain_key(domain) if domain else None
@@ -1,7 +1,10 @@
 """Membership check — force join channel + group before using bot."""
 
+import asyncio
+import itertools
 import logging
 import os
+import time
 
 from telegram import Bot, ChatMember, InlineKeyboardButton, InlineKeyboardMarkup
 
@@ -14,39 +17,96 @@ GROUP_INVITE = os.getenv("GROUP_INVITE", "")
 BOT_USERNAME = os.getenv("BOT_USERNAME", "")
 
 
+def _parse_chat_id(name: str, value: str) -> int | None:
+    """A configured chat id, or None (checks against it fail) if unset or malformed."""
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        logger.error(f"{name}={value!r} is not a numeric chat id; membership checks against it will fail")
+        return None
+
+
+_CHANNEL_CHAT = _parse_chat_id("CHANNEL_ID", CHANNEL_ID)
+_GROUP_CHAT = _parse_chat_id("GROUP_ID", GROUP_ID)
+
+_CHANNEL_STATUSES = (ChatMember.MEMBER, ChatMember.ADMINISTRATOR, ChatMember.OWNER)
+_GROUP_STATUSES = (*_CHANNEL_STATUSES, ChatMember.RESTRICTED)
+
+# Users mash "✅ Saya Sudah Join" and every /report checks both chats, so
+# answers are cached per (chat, user): members for MEMBERSHIP_CACHE_TTL,
+# non-members only briefly so someone who just joined is let in quickly.
+# Failed lookups aren't cached. Concurrent checks of the same (chat, user)
+# share one in-flight request.
+POSITIVE_TTL = int(os.getenv("MEMBERSHIP_CACHE_TTL", "600"))  # seconds
+NEGATIVE_TTL = int(os.getenv("MEMBERSHIP_NEGATIVE_TTL", "5"))  # seconds
+MAX_ENTRIES = 50000
+
+# (chat_id, user_id) -> (is_member, expires at monotonic time)
+_cache: dict[tuple[int, int], tuple[bool, float]] = {}
+_in_flight: dict[tuple[int, int], asyncio.Task] = {}
+_stats = {"hits": 0, "negative_hits": 0, "misses": 0, "shared": 0, "api_calls": 0, "errors": 0}
+
+
+async def _is_member(bot: Bot, chat_id: int, user_id: int, statuses: tuple[str, ...]) -> bool:
+    key = (chat_id, user_id)
+    cached = _cache.get(key)
+    if cached is not None:
+        if cached[1] > time.monotonic():
+            _stats["hits" if cached[0] else "negative_hits"] += 1
+            return cached[0]
+        del _cache[key]
+
+    task = _in_flight.get(key)
+    if task is not None:
+        _stats["shared"] += 1
+    else:
+        _stats["misses"] += 1
+        task = _in_flight[key] = asyncio.create_task(_lookup(bot, chat_id, user_id, statuses))
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    # Shielded: one caller giving up mustn't cancel the others' lookup
+    return await asyncio.shield(task)
+
+
+async def _lookup(bot: Bot, chat_id: int, user_id: int, statuses: tuple[str, ...]) -> bool:
+    _stats["api_calls"] += 1
+    try:
+        member = await bot.get_chat_member(chat_id=chat_id, user_id=user_id)
+    except Exception as e:
+        _stats["errors"] += 1
+        logger.warning(f"Failed to check membership of {user_id} in {chat_id}: {e}")
+        return False
+
+    is_member = member.status in statuses
+    if len(_cache) >= MAX_ENTRIES:
+        _prune()
+    _cache[(chat_id, user_id)] = (is_member, time.monotonic() + (POSITIVE_TTL if is_member else NEGATIVE_TTL))
+    return is_member
+
+
+def _prune() -> None:
+    """Drop expired entries, then the oldest if still full."""
+    now = time.monotonic()
+    for key in [k for k, (_, expires) in _cache.items() if expires <= now]:
+        del _cache[key]
+    for key in list(itertools.islice(_cache, max(len(_cache) - MAX_ENTRIES // 2, 0))):
+        del _cache[key]
+
+
 async def check_membership(bot: Bot, user_id: int) -> dict:
     """
     Check if user is a member of both channel and group.
     Returns dict with 'channel' and 'group' booleans.
     """
-    result = {"channel": False, "group": False}
-
-    # Check channel membership
-    if CHANNEL_ID:
-        try:
-            member = await bot.get_chat_member(chat_id=int(CHANNEL_ID), user_id=user_id)
-            result["channel"] = member.status in (
-                ChatMember.MEMBER,
-                ChatMember.ADMINISTRATOR,
-                ChatMember.OWNER,
-            )
-        except Exception as e:
-            logger.warning(f"Failed to check channel membership for {user_id}: {e}")
-
-    # Check group membership
-    if GROUP_ID:
-        try:
-            member = await bot.get_chat_member(chat_id=int(GROUP_ID), user_id=user_id)
-            result["group"] = member.status in (
-                ChatMember.MEMBER,
-                ChatMember.ADMINISTRATOR,
-                ChatMember.OWNER,
-                ChatMember.RESTRICTED,
-            )
-        except Exception as e:
-            logger.warning(f"Failed to check group membership for {user_id}: {e}")
-
-    return result
+    async def check(chat_id: int | None, statuses: tuple[str, ...]) -> bool:
+        return chat_id is not None and await _is_member(bot, chat_id, user_id, statuses)
+
+    channel, group = await asyncio.gather(
+        check(_CHANNEL_CHAT, _CHANNEL_STATUSES),
+        check(_GROUP_CHAT, _GROUP_STATUSES),
+    )
+    return {"channel": channel, "group": group}
 
 
 async def is_member_of_all(bot: Bot, user_id: int) -> bool:
@@ -55,6 +115,19 @@ async def is_member_of_all(bot: Bot, user_id: int) -> bool:
     return membership["channel"] and membership["group"]
 
 
+def membership_stats() -> dict:
+    """Cache hit counters; every hit or shared lookup is a Bot API call saved."""
+    checks = _stats["hits"] + _stats["negative_hits"] + _stats["misses"] + _stats["shared"]
+    saved = checks - _stats["misses"]
+    return {
+        **_stats,
+        "checks": checks,
+        "saved": saved,
+        "hit_rate": saved / checks if checks else 0.0,
+        "size": len(_cache),
+    }
+
+
 def get_join_keyboard() -> InlineKeyboardMarkup:
     """Build keyboard with join buttons + verify button."""
     buttons = []
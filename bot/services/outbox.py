@@ -0,0 +1,204 @@
+"""Channel post outbox worker: posts queued reports, retries with backoff and notifies the reporter."""
+
+import asyncio
+import logging
+import os
+import time
+
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+
+from bot.database import (
+    claim_channel_posts,
+    finish_channel_post,
+    get_report_by_id,
+    retry_channel_post,
+)
+from bot.services.channel import CHANNEL_INVITE, post_report_to_channel
+from bot.services.render_pool import RenderQueueFull
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "2"))  # posts in flight per replica
+POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))  # seconds
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+BACKOFF_BASE = 5  # seconds, doubled per failed attempt
+BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "600"))  # seconds
+LEASE = float(os.getenv("OUTBOX_LEASE", "300"))  # seconds a claimed job is hidden from other workers
+# Retry delay when the collage render queue is full (not counted as an attempt)
+RENDER_RETRY_DELAY = 5  # seconds
+HANDOFF_TTL = 600  # seconds unclaimed prefetched bytes are kept
+# How long a claimed job waits for screenshots its confirm handler is still collecting
+HANDOFF_WAIT = 15  # seconds
+
+_wakeup = asyncio.Event()
+# report_id -> (monotonic time, file_id -> bytes)
+_handoff: dict[int, tuple[float, dict[str, bytes]]] = {}
+# report_id -> resolved once hand_off() or withdraw() is called for it
+_expected: dict[int, asyncio.Future] = {}
+_stats = {"posted": 0, "retried": 0, "failed": 0, "deferred": 0}
+
+
+def expect(report_id: int) -> None:
+    """
+    Announce screenshots for a report whose job is about to be committed;
+    the worker waits up to HANDOFF_WAIT for hand_off() before posting it.
+    """
+    _expected[report_id] = asyncio.get_running_loop().create_future()
+
+
+def hand_off(report_id: int, prefetched: dict[str, bytes]) -> None:
+    """Give the local worker a report's screenshots."""
+    if prefetched:
+        _handoff[report_id] = (time.monotonic(), prefetched)
+    _resolve(report_id)
+
+
+def withdraw(report_id: int) -> None:
+    """Discard a hand-off whose job was never committed."""
+    _handoff.pop(report_id, None)
+    _resolve(report_id)
+
+
+def _resolve(report_id: int) -> None:
+    waiter = _expected.pop(report_id, None)
+    if waiter is not None and not waiter.done():
+        waiter.set_result(None)
+
+
+def wake() -> None:
+    """Have the worker claim right away, e.g. after a job was committed."""
+    _wakeup.set()
+
+
+def _backoff(attempts: int) -> float:
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+async def run(bot: Bot) -> None:
+    """Claim and post due jobs forever, CONCURRENCY at a time."""
+    in_flight: set[asyncio.Task] = set()
+    try:
+        while True:
+            _expire_handoffs()
+            free = CONCURRENCY - len(in_flight)
+            if free > 0:
+                try:
+                    jobs = await claim_channel_posts(free, LEASE)
+                except Exception as e:
+                    logger.warning(f"Claiming channel posts failed: {e}")
+                    jobs = []
+                for job in jobs:
+                    task = asyncio.create_task(_process(bot, *job))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                if len(jobs) == free:
+                    # Maybe more due; claim again as soon as a slot frees up
+                    await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+
+            # Sleep until a local report is queued, a post finishes or the
+            # poll interval passes (jobs retrying or queued on other replicas)
+            _wakeup.clear()
+            waiter = asyncio.create_task(_wakeup.wait())
+            try:
+                await asyncio.wait(
+                    {waiter, *in_flight}, timeout=POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                waiter.cancel()
+    finally:
+        # Leases of interrupted jobs run out and another worker picks them up
+        for task in in_flight:
+            task.cancel()
+
+
+async def _process(bot: Bot, job_id: int, report_id: int, notify_chat_id: int | None, attempts: int) -> None:
+    waiter = _expected.get(report_id)
+    if waiter is not None:
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), HANDOFF_WAIT)
+        except asyncio.TimeoutError:
+            _expected.pop(report_id, None)
+    prefetched = _handoff.pop(report_id, (0.0, None))[1]
+    try:
+        report = await get_report_by_id(report_id, with_screenshots=True)
+        if report is None:
+            # Deleted while queued
+            await finish_channel_post(job_id, status="failed", error="report deleted")
+            return
+        if report.channel_message_id:
+            # Posted by an earlier attempt that died before finishing the job
+            channel_msg_id = report.channel_message_id
+        else:
+            channel_msg_id = await post_report_to_channel(bot, report, prefetched)
+    except RenderQueueFull:
+        _stats["deferred"] += 1
+        if prefetched:
+            _handoff[report_id] = (time.monotonic(), prefetched)
+        await retry_channel_post(job_id, RENDER_RETRY_DELAY, refund=True)
+        return
+    except Exception as e:
+        if attempts >= MAX_ATTEMPTS:
+            _stats["failed"] += 1
+            logger.error(f"Giving up posting report #{report_id} to channel after {attempts} attempts: {e}")
+            await finish_channel_post(job_id, status="failed", error=str(e))
+            await _notify_failed(bot, notify_chat_id, report_id)
+        else:
+            _stats["retried"] += 1
+            delay = _backoff(attempts)
+            logger.warning(f"Posting report #{report_id} failed (attempt {attempts}), retrying in {delay:.0f}s: {e}")
+            await retry_channel_post(job_id, delay, error=str(e))
+        return
+
+    await finish_channel_post(job_id)
+    _stats["posted"] += 1
+    await _notify_posted(bot, notify_chat_id, report_id, channel_msg_id)
+
+
+def _expire_handoffs() -> None:
+    """Drop screenshots handed off for jobs another replica took."""
+    cutoff = time.monotonic() - HANDOFF_TTL
+    for report_id in [rid for rid, (at, _) in _handoff.items() if at < cutoff]:
+        del _handoff[report_id]
+
+
+async def _notify_posted(bot: Bot, chat_id: int | None, report_id: int, channel_msg_id: int | None) -> None:
+    """Tell the reporter their report is live, with a link to the post."""
+    if not chat_id:
+        return
+    # Build "View in Channel" button if possible
+    reply_markup = None
+    if channel_msg_id and CHANNEL_INVITE:
+        post_link = f"{CHANNEL_INVITE}/{channel_msg_id}"
+        reply_markup = InlineKeyboardMarkup([
+            [InlineKeyboardButton("📢 Lihat di Channel", url=post_link)]
+        ])
+
+    try:
+        await bot.send_message(
+            chat_id=chat_id,
+            text=(
+                f"✅ <b>Laporan #{report_id:04d} telah dipaparkan di channel!</b>\n\n"
+                "Terima kasih kerana membantu komuniti! 🙏"
+            ),
+            parse_mode="HTML",
+            reply_markup=reply_markup,
+        )
+    except Exception as e:
+        logger.warning(f"Couldn't notify reporter of report #{report_id}: {e}")
+
+
+async def _notify_failed(bot: Bot, chat_id: int | None, report_id: int) -> None:
+    if not chat_id:
+        return
+    try:
+        await bot.send_message(
+            chat_id=chat_id,
+            text=f"❌ Maaf, laporan #{report_id:04d} gagal dipaparkan di channel. Admin akan semak.",
+        )
+    except Exception as e:
+        logger.warning(f"Couldn't notify reporter of report #{report_id}: {e}")
+
+
+def outbox_stats() -> dict:
+    return {**_stats, "in_memory_handoffs": len(_handoff)}
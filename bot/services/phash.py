@@ -0,0 +1,42 @@
+"""Perceptual hashing (dHash) of evidence screenshots.
+
+A dHash is 64 bits: the image is shrunk to 9x8 greyscale and each bit says
+whether a pixel is brighter than its right neighbour. Re-encoded, resized
+or lightly cropped copies of a screenshot land within a few bits of each
+other, so near-duplicate evidence is found by Hamming distance.
+"""
+
+import io
+
+from PIL import Image
+
+HASH_BITS = 64
+
+
+def dhash_image(img: Image.Image) -> int:
+    """dHash of an already decoded image."""
+    small = img.convert("L").resize((9, 8), Image.Resampling.BOX)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def dhash(data: bytes) -> int | None:
+    """dHash of encoded image bytes; None if they can't be decoded."""
+    try:
+        img = Image.open(io.BytesIO(data))
+        # Reduced DCT-scale decode; much smaller scales shift the hash of
+        # small re-encoded copies by several bits
+        img.draft("L", (256, 256))
+        return dhash_image(img)
+    except Exception:
+        return None
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
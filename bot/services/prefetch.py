@@ -0,0 +1,155 @@
+"""Screenshot prefetch: report screenshots download as they arrive and are reused on confirm."""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from telegram import Bot
+
+from bot.services.channel import download_screenshots
+from bot.services.phash import dhash
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES = int(os.getenv("PREFETCH_MAX_MB", "64")) * 1024 * 1024
+TTL = int(os.getenv("PREFETCH_TTL", "900"))  # seconds since last screenshot
+SWEEP_INTERVAL = 60  # seconds
+
+ConversationKey = tuple[int, int]  # (chat_id, user_id)
+
+
+class _Conversation:
+    __slots__ = ("tasks", "data", "hashes", "size", "touched")
+
+    def __init__(self) -> None:
+        self.tasks: dict[str, asyncio.Task] = {}
+        self.data: dict[str, bytes] = {}
+        self.hashes: dict[str, int] = {}
+        self.size = 0
+        self.touched = time.monotonic()
+
+
+# Least recently active first
+_conversations: OrderedDict[ConversationKey, _Conversation] = OrderedDict()
+_total_bytes = 0
+_stats = {"started": 0, "hits": 0, "misses": 0, "evicted": 0, "expired": 0, "over_cap": 0}
+
+
+def start(bot: Bot, key: ConversationKey, file_id: str) -> None:
+    """Begin downloading a screenshot in the background."""
+    conv = _conversations.get(key)
+    if conv is None:
+        conv = _conversations[key] = _Conversation()
+    _conversations.move_to_end(key)
+    conv.touched = time.monotonic()
+
+    if file_id in conv.tasks or file_id in conv.data:
+        return
+    conv.tasks[file_id] = asyncio.create_task(_fetch(bot, key, conv, file_id))
+    _stats["started"] += 1
+
+
+async def _fetch(bot: Bot, key: ConversationKey, conv: _Conversation, file_id: str) -> None:
+    global _total_bytes
+    try:
+        images = await download_screenshots(bot, [file_id])
+    finally:
+        conv.tasks.pop(file_id, None)
+
+    # Conversation may have been dropped while downloading
+    if not images or _conversations.get(key) is not conv:
+        return
+    data = images[0]
+    # Fingerprint for the duplicate check in the confirm preview; cheap,
+    # the JPEG is decoded at reduced scale
+    phash = await asyncio.to_thread(dhash, data)
+    if phash is not None:
+        conv.hashes[file_id] = phash
+    if _conversations.get(key) is not conv:
+        return
+    if not _make_room(len(data), keep=key):
+        _stats["over_cap"] += 1
+        return
+    conv.data[file_id] = data
+    conv.size += len(data)
+    _total_bytes += len(data)
+
+
+def _make_room(size: int, keep: ConversationKey) -> bool:
+    """Evict other conversations (oldest first) until `size` more bytes fit."""
+    for other in list(_conversations):
+        if _total_bytes + size <= MAX_BYTES:
+            break
+        if other != keep:
+            drop(other)
+            _stats["evicted"] += 1
+    return _total_bytes + size <= MAX_BYTES
+
+
+async def collect(key: ConversationKey) -> dict[str, bytes]:
+    """
+    Wait for in-flight prefetches and return file_id -> bytes for those that
+    succeeded. The conversation's prefetch state is dropped afterwards.
+    """
+    conv = _conversations.get(key)
+    if conv is None:
+        return {}
+
+    started = len(conv.tasks) + len(conv.data)
+    if conv.tasks:
+        await asyncio.gather(*conv.tasks.values(), return_exceptions=True)
+
+    ready = dict(conv.data)
+    _stats["hits"] += len(ready)
+    _stats["misses"] += started - len(ready)
+    drop(key)
+    return ready
+
+
+async def hashes(key: ConversationKey, timeout: float) -> dict[str, int]:
+    """file_id -> dHash of prefetched screenshots, waiting up to `timeout` for pending ones."""
+    conv = _conversations.get(key)
+    if conv is None:
+        return {}
+    if conv.tasks:
+        await asyncio.wait(list(conv.tasks.values()), timeout=timeout)
+    return dict(conv.hashes)
+
+
+def drop(key: ConversationKey) -> None:
+    """Forget a conversation's prefetched screenshots, cancelling downloads."""
+    global _total_bytes
+    conv = _conversations.pop(key, None)
+    if conv is None:
+        return
+    for task in conv.tasks.values():
+        task.cancel()
+    _total_bytes -= conv.size
+    conv.data.clear()
+    conv.size = 0
+
+
+def sweep() -> int:
+    """Drop conversations idle for longer than TTL; returns how many."""
+    cutoff = time.monotonic() - TTL
+    expired = [key for key, conv in _conversations.items() if conv.touched < cutoff]
+    for key in expired:
+        drop(key)
+    _stats["expired"] += len(expired)
+    return len(expired)
+
+
+def drop_all() -> None:
+    for key in list(_conversations):
+        drop(key)
+
+
+def prefetch_stats() -> dict:
+    return {
+        **_stats,
+        "conversations": len(_conversations),
+        "bytes": _total_bytes,
+        "limit": MAX_BYTES,
+    }
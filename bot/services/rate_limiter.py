@@ -0,0 +1,200 @@
+"""Token-bucket rate limiting for every Bot API call the bot makes.
+
+Installed on the Application (ApplicationBuilder.rate_limiter), so all
+calls through context.bot / application.bot — replies, channel posts,
+broadcasts — share these buckets:
+
+* global: RATE_LIMIT_GLOBAL calls per second across all chats
+* per private chat: RATE_LIMIT_CHAT messages per second
+* per group/channel: RATE_LIMIT_GROUP messages per minute (Telegram's
+  stricter limit for multi-member chats)
+
+Per-chat buckets only meter calls that put something in the chat (send*,
+copy/forward, edits); lookups such as getChatMember or getFile only take
+a global token, and a few housekeeping calls aren't limited at all.
+
+A RetryAfter from Telegram pauses only the bucket it concerns — the
+chat's, or the global one for calls without a chat — and the call is
+retried up to RATE_LIMIT_MAX_RETRIES times once the pause is over.
+
+Calls carry a priority via `rate_limit_args` (default INTERACTIVE).
+BULK calls (broadcast) wait while interactive calls are queued for the
+global bucket and leave BULK_RESERVE tokens untouched, so replies to
+users don't queue behind a broadcast.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = float(os.getenv("RATE_LIMIT_GLOBAL", "30"))  # calls per second
+CHAT_RATE = float(os.getenv("RATE_LIMIT_CHAT", "1"))  # messages per second, private chats
+GROUP_RATE = float(os.getenv("RATE_LIMIT_GROUP", "20")) / 60  # messages per minute, groups/channels
+MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "2"))
+CHAT_BURST = 3  # back-to-back messages a chat may get before its rate applies
+BULK_RESERVE = 3  # global tokens bulk sends leave for interactive calls
+MAX_CHAT_BUCKETS = 10000  # idle full buckets are pruned beyond this
+
+# Priorities, passed as rate_limit_args
+INTERACTIVE = 0
+BULK = 1
+
+# Never limited: housekeeping and calls that don't count toward flood limits
+_UNLIMITED = {"getMe", "getFile", "answerCallbackQuery", "setMyCommands", "setWebhook", "deleteWebhook"}
+# Calls that show up in the target chat and so count toward its limit
+_CHAT_PREFIXES = ("send", "copyMessage", "forwardMessage", "edit")
+
+
+class _Bucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated", "paused_until", "interactive_waiting")
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.interactive_waiting = 0
+
+    def wait_time(self, now: float, reserve: float = 0) -> float:
+        """Seconds until a token can be taken with `reserve` left over; 0 means now."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        missing = 1 + reserve - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def idle(self, now: float) -> bool:
+        self.wait_time(now)
+        return self.tokens >= self.capacity and now >= self.paused_until and not self.interactive_waiting
+
+
+class TelegramRateLimiter(BaseRateLimiter[int]):
+    def __init__(self) -> None:
+        self._global = _Bucket(GLOBAL_RATE, GLOBAL_RATE)
+        self._chats: dict[int | str, _Bucket] = {}
+        self._stats = {"calls": 0, "delayed": 0, "wait_total": 0.0, "retry_after": 0, "gave_up": 0}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def _chat_bucket(self, chat_id: int | str) -> _Bucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                self._prune()
+            # Groups and channels have negative ids (or are addressed by @username)
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            rate = GROUP_RATE if is_group else CHAT_RATE
+            bucket = self._chats[chat_id] = _Bucket(rate, CHAT_BURST)
+        return bucket
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for chat_id in [c for c, b in self._chats.items() if b.idle(now)]:
+            del self._chats[chat_id]
+
+    async def _acquire(self, chat: _Bucket | None, priority: int) -> None:
+        start = time.monotonic()
+        reserve = BULK_RESERVE if priority == BULK else 0
+        queued = False
+        try:
+            while True:
+                now = time.monotonic()
+                if chat is not None:
+                    delay = chat.wait_time(now)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                        continue
+                delay = self._global.wait_time(now, reserve)
+                if priority == BULK and self._global.interactive_waiting:
+                    delay = max(delay, 1 / self._global.rate)
+                if delay == 0:
+                    # No await since the checks, so both tokens are still there
+                    self._global.tokens -= 1
+                    if chat is not None:
+                        chat.tokens -= 1
+                    break
+                if priority == INTERACTIVE and not queued:
+                    queued = True
+                    self._global.interactive_waiting += 1
+                await asyncio.sleep(delay)
+        finally:
+            if queued:
+                self._global.interactive_waiting -= 1
+        waited = time.monotonic() - start
+        if waited > 0.001:
+            self._stats["delayed"] += 1
+            self._stats["wait_total"] += waited
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, bool | dict[str, Any] | list[dict[str, Any]]]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: int | None,
+    ) -> bool | dict[str, Any] | list[dict[str, Any]]:
+        if endpoint in _UNLIMITED:
+            return await callback(*args, **kwargs)
+
+        priority = INTERACTIVE if rate_limit_args is None else rate_limit_args
+        chat = None
+        chat_id = data.get("chat_id")
+        if chat_id is not None and endpoint.startswith(_CHAT_PREFIXES):
+            try:
+                chat_id = int(chat_id)
+            except (TypeError, ValueError):
+                pass  # @channelusername
+            chat = self._chat_bucket(chat_id)
+
+        self._stats["calls"] += 1
+        attempt = 0
+        while True:
+            await self._acquire(chat, priority)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self._stats["retry_after"] += 1
+                bucket = chat or self._global
+                bucket.paused_until = max(bucket.paused_until, time.monotonic() + float(e.retry_after))
+                logger.warning(
+                    f"Flood limit on {endpoint} ({'chat ' + str(chat_id) if chat else 'global'}), "
+                    f"paused {e.retry_after}s"
+                )
+                if attempt >= MAX_RETRIES:
+                    self._stats["gave_up"] += 1
+                    raise
+                attempt += 1
+
+    def stats(self) -> dict:
+        calls = self._stats["calls"]
+        now = time.monotonic()
+        return {
+            **self._stats,
+            "wait_avg_ms": self._stats["wait_total"] / self._stats["delayed"] * 1000 if self._stats["delayed"] else 0.0,
+            "delayed_ratio": self._stats["delayed"] / calls if calls else 0.0,
+            "chat_buckets": len(self._chats),
+            "paused_buckets": sum(1 for b in self._chats.values() if b.paused_until > now)
+            + (self._global.paused_until > now),
+        }
+
+
+rate_limiter = TelegramRateLimiter()
+
+
+def rate_limiter_stats() -> dict:
+    return rate_limiter.stats()
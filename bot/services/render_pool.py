@@ -0,0 +1,104 @@
+"""Collage rendering on a bounded process pool, off the event loop."""
+
+import asyncio
+import contextlib
+import logging
+import multiprocessing
+import os
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+
+from bot.services.collage import create_grid_collage
+
+logger = logging.getLogger(__name__)
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+RENDER_QUEUE_LIMIT = int(os.getenv("RENDER_QUEUE_LIMIT", "8"))  # running + waiting
+
+_executor: ProcessPoolExecutor | None = None
+_pending = 0
+
+
+class RenderQueueFull(Exception):
+    """Too many collages are already being rendered."""
+
+
+def _warmup() -> int:
+    # Importing this module in the worker already loaded Pillow
+    return os.getpid()
+
+
+async def start() -> None:
+    """Create the pool and spawn every worker up front."""
+    global _executor
+    if _executor is not None or RENDER_WORKERS <= 0:
+        return
+    # spawn, not fork: the parent has running threads (httpx, aiosqlite)
+    _executor = ProcessPoolExecutor(
+        max_workers=RENDER_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+    loop = asyncio.get_running_loop()
+    pids = await asyncio.gather(
+        *(loop.run_in_executor(_executor, _warmup) for _ in range(RENDER_WORKERS))
+    )
+    logger.info(f"Render pool ready: {len(set(pids))} worker processes")
+
+
+def shutdown() -> None:
+    """Stop the workers; renders in progress are cancelled."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+@contextlib.contextmanager
+def reserve() -> Iterator[None]:
+    """
+    Hold one of RENDER_QUEUE_LIMIT render slots (running or waiting) for
+    the block; raises RenderQueueFull at once if none is free, so callers
+    can back off before downloading anything.
+    """
+    global _pending
+    if _pending >= RENDER_QUEUE_LIMIT:
+        raise RenderQueueFull(f"{_pending} renders in flight")
+    _pending += 1
+    try:
+        yield
+    finally:
+        _pending -= 1
+
+
+def render_stats() -> dict:
+    return {"workers": RENDER_WORKERS, "pending": _pending, "limit": RENDER_QUEUE_LIMIT}
+
+
+async def render_collage(image_bytes_list: list[bytes], hashes: list | None = None, **kwargs) -> bytes:
+    """
+    Render a grid collage in a worker process.
+
+    If `hashes` is given it is filled with each screenshot's dHash (see
+    assemble_collage), a by-product of the render's own decoding.
+
+    Call inside reserve(). Falls back to a thread when the pool isn't
+    running (scripts, tests).
+    """
+    loop = asyncio.get_running_loop()
+    if _executor is None:
+        return await asyncio.to_thread(create_grid_collage, image_bytes_list, hashes=hashes, **kwargs)
+    data, worker_hashes = await loop.run_in_executor(
+        _executor, _render, image_bytes_list, kwargs
+    )
+    if hashes is not None:
+        hashes.extend(worker_hashes)
+    return data
+
+
+def _render(image_bytes_list: list[bytes], kwargs: dict) -> tuple[bytes, list]:
+    # run_in_executor takes no kwargs — unpack them in the worker. The list
+    # is this process's own unpickled copy, so the collage may consume it
+    # and free each screenshot once it has been pasted.
+    hashes: list = []
+    data = create_grid_collage(image_bytes_list, consume=True, hashes=hashes, **kwargs)
+    return data, hashes
@@ -0,0 +1,85 @@
+import io
+import multiprocessing
+import os
+
+import pytest
+from PIL import Image, ImageDraw
+
+from bot.services import collage
+
+
+def _noise(size: int) -> Image.Image:
+    # Random pixels barely compress, so every quality is over a small budget
+    return Image.frombytes("RGB", (size, size), os.urandom(size * size * 3))
+
+
+def test_encode_collage_min_quality_at_or_above_max(monkeypatch):
+    # COLLAGE_MIN_QUALITY=95 with the default GRID_QUALITY of 92
+    monkeypatch.setattr(collage, "MIN_QUALITY", 95)
+    monkeypatch.setattr(collage, "MAX_BYTES", 20 * 1024)
+
+    data = collage.encode_collage(_noise(400))
+
+    assert data
+    assert Image.open(io.BytesIO(data)).width < 400
+
+
+def _jpeg(size: tuple[int, int], seed: int) -> bytes:
+    img = Image.new("RGB", size, (seed * 40 % 256, 90, 160))
+    ImageDraw.Draw(img).rectangle((size[0] // 4, size[1] // 4, size[0] // 2, size[1] // 2), fill=(250, 250, 250))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+def _peak_rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    raise OSError("no VmHWM")
+
+
+def _render_under_cap(images: list[bytes], cap_mb: int, out) -> None:
+    collage.MEMORY_CAP = cap_mb * 1024 * 1024
+    baseline = _peak_rss_mb()
+    # Full decodes: without the one-source-at-a-time layout nine of these
+    # (36 MB each) would need several times the cap
+    canvas = collage.assemble_collage(images, fast_decode=False)
+    collage.encode_collage(canvas)
+    out.put(_peak_rss_mb() - baseline)
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="needs /proc VmHWM")
+def test_assemble_collage_stays_within_memory_cap():
+    cap_mb = 64
+    images = [_jpeg((4000, 3000), i) for i in range(9)]
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_render_under_cap, args=(images, cap_mb, out))
+    proc.start()
+    growth = out.get(timeout=120)
+    proc.join()
+
+    # Cap plus slack for the resize intermediates and the encoder
+    assert growth < cap_mb + 32
+
+
+def test_sources_over_memory_cap_are_left_out(monkeypatch):
+    monkeypatch.setattr(collage, "MEMORY_CAP", 8 * 1024 * 1024)
+    hashes = []
+
+    canvas = collage.assemble_collage([_jpeg((4000, 3000), 0), _jpeg((400, 300), 1)], fast_decode=False, hashes=hashes)
+
+    assert hashes[0] is None and hashes[1] is not None
+    assert canvas.size[0] > canvas.size[1]
+
+
+def test_single_source_over_memory_cap_gives_empty_cell(monkeypatch):
+    monkeypatch.setattr(collage, "MEMORY_CAP", 1024 * 1024)
+    hashes = []
+
+    data = collage.create_grid_collage([_jpeg((4000, 3000), 0)], fast_decode=False, hashes=hashes)
+
+    assert hashes == [None]
+    assert Image.open(io.BytesIO(data)).size == (collage.CELL_SIZE, collage.CELL_SIZE)